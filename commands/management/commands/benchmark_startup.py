@@ -0,0 +1,40 @@
+import statistics
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+DEFAULT_RUNS = 5
+DEFAULT_COMMAND = "run_watchers"
+
+
+def measure_startup(command: str, runs: int) -> list[float]:
+    """
+    Each run is a new process, so imports and module level initialization are measured as well
+    :param command: management command to start with --help
+    :param runs:
+    :return: seconds spent for each run
+    """
+    timings: list[float] = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "manage.py", command, "--help"], check=True, capture_output=True)
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+class Command(BaseCommand):
+    help = "Measure start time of a management command (manage.py <command> --help)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--command", default=DEFAULT_COMMAND, help="Management command to measure")
+        parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="Number of measured runs")
+
+    def handle(self, **options):
+        command = options["command"]
+        timings = measure_startup(command, options["runs"])
+
+        print(f"manage.py {command} --help | runs: {len(timings)}")
+        print(f"min: {min(timings):.3f}s | median: {statistics.median(timings):.3f}s | max: {max(timings):.3f}s")
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from constants.enums import ContentCategory, ContentWatcherSourceType, ContentWatcherStatus, VideoQuality
+from contenting.models import ContentList, ContentWatcher
+from contenting.reganam_tnetnoc.watchers.youtube.api import YoutubeWorker
+from contenting.reganam_tnetnoc.watchers.youtube.django_manager import YoutubeWatcherDjangoManager
+from contenting.reganam_tnetnoc.watchers.youtube.fake_api import FakeYoutubeServer, FakeYoutubeData
+from contenting.reganam_tnetnoc.watchers.youtube.feed import YoutubeFeed
+from utils.datetime_utils import default_utc
+
+MODE_UPDATES = "updates"
+MODE_INTEGRITY = "integrity"
+
+DEFAULT_CHANNELS = 20
+DEFAULT_UPLOADS = 500
+
+
+class Rollback(Exception):
+    pass
+
+
+def create_watchers(channels: int) -> list[ContentWatcher]:
+    watchers: list[ContentWatcher] = []
+    for i in range(channels):
+        name = f"benchmark_{i}"
+        content_list = ContentList.objects.create(name=name, category=ContentCategory.OTHER.value,
+                                                  migration_position=0)
+        watcher = ContentWatcher.objects.create(name=name, category=ContentCategory.OTHER.value,
+                                                watcher_id=FakeYoutubeData.channel_id(i),
+                                                source_type=ContentWatcherSourceType.YOUTUBE.value,
+                                                status=ContentWatcherStatus.WAITING.value, download=False,
+                                                video_quality=VideoQuality.DEFAULT.value, content_list=content_list)
+        watchers.append(watcher)
+    return watchers
+
+
+def run_updates(worker: YoutubeWorker, feed: YoutubeFeed, channels: int, log_file: str) -> int:
+    """
+    Watchers are created and updated inside a transaction which is rolled back at the end, so DB stays untouched
+    :return: number of items saved
+    """
+    items_count = 0
+    try:
+        with transaction.atomic():
+            for watcher in create_watchers(channels):
+                manager = YoutubeWatcherDjangoManager(worker, watcher, log_file=log_file, feed=feed)
+                manager.run_updates()
+                items_count += watcher.get_items_count()
+            raise Rollback()
+    except Rollback:
+        pass
+
+    return items_count
+
+
+def run_integrity(worker: YoutubeWorker, channels: int) -> int:
+    """
+    :return: number of items received
+    """
+    items_count = 0
+    for i in range(channels):
+        channel_id = FakeYoutubeData.channel_id(i)
+        worker.set_context(channel_id)
+        items_count += len(worker.get_uploads(channel_id, default_utc()))
+    return items_count
+
+
+class Command(BaseCommand):
+    help = "Measure watchers throughput against a local fake YouTube API (N channels x M uploads)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=[MODE_UPDATES, MODE_INTEGRITY], default=MODE_INTEGRITY)
+        parser.add_argument("--channels", type=int, default=DEFAULT_CHANNELS, help="Number of fake channels")
+        parser.add_argument("--uploads", type=int, default=DEFAULT_UPLOADS, help="Uploads per fake channel")
+
+    def handle(self, **options):
+        mode = options["mode"]
+        channels = options["channels"]
+        uploads = options["uploads"]
+
+        temp_dir = tempfile.mkdtemp(prefix="benchmark_watchers_")
+        dk_file = os.path.join(temp_dir, "dk.txt")
+        log_file = os.path.join(temp_dir, "api_logs.jsonl")
+        with open(dk_file, "w") as f:
+            f.write("fake_key\n")
+
+        with FakeYoutubeServer(FakeYoutubeData(channels, uploads)) as server:
+            worker = YoutubeWorker(dk_file, api_root=server.url)
+            feed = YoutubeFeed(server.feed_url)
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            if mode == MODE_UPDATES:
+                items_count = run_updates(worker, feed, channels, log_file)
+            else:
+                items_count = run_integrity(worker, channels)
+            duration = time.perf_counter() - start
+            _, peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        print(f"Mode: {mode} | Channels: {channels} | Uploads per channel: {uploads}")
+        print(f"Items: {items_count} | Time: {duration:.2f}s | Items/sec: {items_count / duration:.1f} | "
+              f"Peak memory: {peak_memory / 1024 / 1024:.1f} MB")
+        for line in worker.stats.summary():
+            print(line)
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from contenting.models import ContentList
+
+
+class Command(BaseCommand):
+    help = "Recompute the item counters of the content lists from their items and report the lists which drifted"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ids", type=int, nargs="+", help="Lists to recount. Default - all")
+
+    def handle(self, **options):
+        content_lists = ContentList.objects.all()
+        if options["ids"]:
+            content_lists = content_lists.filter(pk__in=options["ids"])
+
+        fields = ["pk", "name"] + ContentList.COUNTER_FIELDS
+        with transaction.atomic():
+            before = {row[0]: row for row in content_lists.select_for_update().values_list(*fields)}
+            updated = content_lists.recount()
+            after = {row[0]: row for row in content_lists.values_list(*fields)}
+
+        drifted = [pk for pk, row in after.items() if before.get(pk) != row]
+        for pk in drifted:
+            changes = [f"{name}: {old} -> {new}"
+                       for name, old, new in zip(ContentList.COUNTER_FIELDS, before[pk][2:], after[pk][2:])
+                       if old != new]
+            print(f"<{pk}> {after[pk][1].ljust(30)} || {' | '.join(changes)}")
+        print(f"Lists recounted: {updated} | Fixed: {len(drifted)}")
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from constants.enums import PublishDateConflictPolicy
+from contenting.models import PublishDateConflict
+
+
+class Command(BaseCommand):
+    help = "List or resolve in bulk the publish date conflicts deferred by the watchers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--resolve", choices=[PublishDateConflictPolicy.MAIN.value,
+                                                  PublishDateConflictPolicy.SECONDARY.value],
+                            help="Date to apply on the items. Without it, unresolved conflicts are only listed")
+        parser.add_argument("--ids", type=int, nargs="+", help="Conflicts to resolve. Default - all unresolved")
+        parser.add_argument("--watcher", help="Only conflicts of this watcher (watcher_id)")
+
+    def handle(self, **options):
+        conflicts = PublishDateConflict.objects.filter_unresolved().select_related("content_watcher__content_list")
+        if options["ids"]:
+            conflicts = conflicts.filter(pk__in=options["ids"])
+        if options["watcher"]:
+            conflicts = conflicts.filter(content_watcher__watcher_id=options["watcher"])
+        conflicts = list(conflicts.order_by("created_at"))
+
+        if not options["resolve"]:
+            for conflict in conflicts:
+                print(f"{conflict.content_watcher.name.ljust(30)} || {conflict}")
+            print(f"Unresolved conflicts: {len(conflicts)}")
+            return
+
+        resolution = PublishDateConflictPolicy.from_str(options["resolve"])
+        with transaction.atomic():
+            for conflict in conflicts:
+                conflict.resolve(resolution)
+        print(f"Resolved conflicts: {len(conflicts)} - {resolution.value}")
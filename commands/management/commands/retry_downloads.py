@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+
+from constants import env, paths
+from contenting.models import ContentItem
+from contenting.reganam_tnetnoc.utils.download_pool import DownloadPool, DEFAULT_WATCHER_DOWNLOADS, \
+    DEFAULT_GLOBAL_DOWNLOADS
+from contenting.reganam_tnetnoc.watchers.youtube.api import YoutubeWorker
+from contenting.reganam_tnetnoc.watchers.youtube.django_manager import items_ids_to_objects
+from contenting.reganam_tnetnoc.watchers.youtube.lease import WatcherLease
+from contenting.reganam_tnetnoc.watchers.youtube.retry import RetryEngine, DEFAULT_CONCURRENCY
+
+
+class Command(BaseCommand):
+    help = "Retry the failed downloads (UNABLE / MISSING) of all download watchers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ids", nargs="+",
+                            help="Retry only these items (item_id), regardless of their backoff and attempts")
+        parser.add_argument("--watchers", nargs="+", help="Only items of these watchers (watcher_id)")
+        parser.add_argument("--force", action="store_true", help="Ignore the backoff of the items")
+        parser.add_argument("--max-attempts", type=int, default=ContentItem.RETRY_MAX_ATTEMPTS,
+                            help="Items which failed this many times are not retried")
+        parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                            help="Number of watchers retried at the same time")
+        parser.add_argument("--watcher-downloads", type=int, default=DEFAULT_WATCHER_DOWNLOADS,
+                            help="Max parallel downloads of a single watcher")
+        parser.add_argument("--global-downloads", type=int, default=DEFAULT_GLOBAL_DOWNLOADS,
+                            help="Max parallel downloads of all watchers")
+        parser.add_argument("--bandwidth", type=int, default=0,
+                            help="Max total download speed, KB/s. 0 - unlimited")
+        parser.add_argument("--split-video", action="store_true",
+                            help="Download video and audio parts separately and merge them after (one video at a time "
+                                 "per watcher), instead of a single yt-dlp run")
+        parser.add_argument("--dry-run", action="store_true", help="Only list the items which would be retried")
+
+    def handle(self, **options):
+        download_pool = DownloadPool(env.FFMPEG, watcher_downloads=options["watcher_downloads"],
+                                     global_downloads=options["global_downloads"], bandwidth=options["bandwidth"] * 1024,
+                                     native_merge=not options["split_video"])
+        lease = WatcherLease()
+        engine = RetryEngine(YoutubeWorker(paths.API_KEY_PATH), download_pool, lease=lease,
+                             concurrency=options["concurrency"], max_attempts=options["max_attempts"])
+
+        if options["ids"]:
+            items = items_ids_to_objects(options["ids"])
+        else:
+            items = engine.get_items(force=options["force"], watcher_ids=options["watchers"])
+
+        if options["dry_run"]:
+            for item in items:
+                print(f"{item.content_list.name.ljust(30)} || {item.item_id} - {item.download_status} - "
+                      f"attempts: {item.download_attempts} - {item.download_error}")
+            print(f"Items to retry: {len(items)}")
+            return
+
+        lease.start_heartbeat()
+        try:
+            downloaded, failed, skipped = engine.run(items)
+        finally:
+            lease.stop_heartbeat()
+            download_pool.close()
+        print(f"Items retried: {len(items) - skipped} | Downloaded: {downloaded} | Failed: {failed} | "
+              f"Skipped (claimed by another worker): {skipped}")
@@ -1,24 +1,216 @@
 import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from datetime import timedelta
 
 from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
 
-from constants import paths
-from contenting.models import ContentWatcher
+from constants import paths, env
+from constants.enums import PublishDateConflictPolicy, ContentWatcherStatus
+from contenting.models import ContentWatcher, YoutubeApiCall
 from contenting.queryset import ContentWatcherQuerySet
+from contenting.reganam_tnetnoc.utils.download_pool import DownloadPool, DEFAULT_WATCHER_DOWNLOADS, \
+    DEFAULT_GLOBAL_DOWNLOADS
 from contenting.reganam_tnetnoc.watchers.youtube.api import YoutubeWorker
-from contenting.reganam_tnetnoc.watchers.youtube.django_manager import YoutubeWatcherDjangoManager, items_ids_to_objects
+from contenting.reganam_tnetnoc.watchers.youtube.django_manager import YoutubeWatcherDjangoManager
+from contenting.reganam_tnetnoc.watchers.youtube.feed import YoutubeFeed
+from contenting.reganam_tnetnoc.watchers.youtube.lease import WatcherLease
 from contenting.reganam_tnetnoc.watchers.youtube.manager import YoutubeWatchersManager
+from contenting.reganam_tnetnoc.watchers.youtube.pipeline import WatcherPipeline
+from contenting.reganam_tnetnoc.watchers.youtube.scheduler import WatcherScheduler, MAX_STALENESS, \
+    UNSCHEDULED_STATUSES
+from utils import datetime_utils
+from utils.rate_limiter import RateLimiter
 
 dk_file = paths.API_KEY_PATH
 worker = YoutubeWorker(dk_file)
+# Shared by all watchers, replaced in handle by the command options
+download_pool = DownloadPool(env.FFMPEG)
+# Watchers are claimed before running, so multiple run_watchers processes can share the same DB
+lease = WatcherLease()
 
+DEFAULT_CONCURRENCY = 1
+DEFAULT_RATE = 2.0  # API requests per second, shared by all sweep threads
+DEFAULT_WATCHER_TIMEOUT = 600  # seconds
+DEFAULT_DOWNLOAD_WORKERS = 2
+DAEMON_MIN_SLEEP = 60  # seconds
+DAEMON_MAX_SLEEP = 900  # seconds
+# Watchers whose uploads playlist is not resolved are not requested again (and not due) for this long
+UNRESOLVED_RETRY_DELAY = timedelta(days=1)
+
+
+def run_watcher(watcher: ContentWatcher, feed: YoutubeFeed | None, scheduler: WatcherScheduler | None,
+                deadline: float = None) -> None:
+    due_before = scheduler.now() if scheduler else None
+    if not lease.claim(watcher, unchanged=True, due_before=due_before):
+        print(f"Watcher <{watcher.name}> is claimed or already checked by another worker")
+        return
+
+    try:
+        manager = YoutubeWatcherDjangoManager(worker, watcher, log_file=paths.YOUTUBE_API_LOG, feed=feed,
+                                              download_pool=download_pool, deadline=deadline)
+        manager.run_updates()
+        # On failure watcher stays due, so it is checked again on next sweep
+        if scheduler and watcher.status == ContentWatcherStatus.FINISHED.value:
+            scheduler.reschedule(watcher)
+    finally:
+        lease.release(watcher)
+
+
+def run_watcher_updates(watcher: ContentWatcher, started: dict[int, float], timeout: float,
+                        feed: YoutubeFeed | None, scheduler: WatcherScheduler | None) -> None:
+    """
+    Executed inside a sweep thread. Each thread uses its own DB connection, closed at the end.
+    """
+    started[watcher.pk] = time.monotonic()
+    try:
+        run_watcher(watcher, feed, scheduler, deadline=started[watcher.pk] + timeout)
+    finally:
+        connection.close()
+
+
+def run_updates_concurrent(watchers: list[ContentWatcher], concurrency: int, timeout: float,
+                           feed: YoutubeFeed | None, scheduler: WatcherScheduler | None) -> None:
+    """
+    Run updates for multiple watchers at once. The request rate is limited by worker.rate_limiter.
+
+    A watcher which runs longer than timeout is stopped before its next API page or download, and fails
+    (it stays due, so it is checked again on next sweep). A running request or download can't be interrupted,
+    so the timed out watcher is reported and the other watchers go on. Its thread still counts against concurrency:
+    the function returns only after all threads ended, so the next group never runs more than concurrency watchers.
+    :param watchers:
+    :param concurrency: max number of watchers checked at the same time
+    :param timeout: max seconds a single watcher runs, counted from its start
+    :param feed: channel feed checked before the API. None - always check API
+    :param scheduler: reschedules each checked watcher. None - no schedule
+    :return:
+    """
+    started: dict[int, float] = {}
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="watcher")
+    pending: dict[Future, ContentWatcher] = {
+        executor.submit(run_watcher_updates, watcher, started, timeout, feed, scheduler): watcher
+        for watcher in watchers
+    }
+    timed_out: dict[Future, ContentWatcher] = {}
+    try:
+        while pending:
+            done, _ = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+            for future in done:
+                watcher = pending.pop(future)
+                if e := future.exception():
+                    print(f"Watcher <{watcher.name}> failed: {repr(e)}")
+
+            now = time.monotonic()
+            for future, watcher in list(pending.items()):
+                start = started.get(watcher.pk)
+                if start is not None and now - start > timeout:
+                    print(f"Watcher <{watcher.name}> timed out after {timeout}s. Stops before its next API page "
+                          f"or download.")
+                    timed_out[future] = pending.pop(future)
+    finally:
+        if timed_out:
+            print(f"Waiting for {len(timed_out)} timed out watchers to stop")
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    for future, watcher in timed_out.items():
+        if not future.cancelled() and (e := future.exception()):
+            print(f"Watcher <{watcher.name}> failed: {repr(e)}")
+
+
+def prefetch_uploads_playlist_ids() -> None:
+    """
+    Resolve uploads playlist of all watchers which don't have it cached yet, using bulk API requests.
+    Watchers which are never checked are skipped. A watcher which is not resolved gets its next_check_date delayed
+    by UNRESOLVED_RETRY_DELAY, it is not requested again before that.
+    :return:
+    """
+    now = WatcherScheduler.now()
+    unresolved = (ContentWatcher.objects.filter(uploads_playlist_id="")
+                  .exclude(status__in=UNSCHEDULED_STATUSES)
+                  .filter(Q(next_check_date__isnull=True) | Q(next_check_date__lte=now)))
+    watchers = [watcher for watcher in unresolved if not watcher.is_test_object()]
+    if not watchers:
+        return
+
+    playlist_ids = worker.get_uploads_playlist_ids([watcher.watcher_id for watcher in watchers])
+    resolved: list[ContentWatcher] = []
+    failed: list[ContentWatcher] = []
+    for watcher in watchers:
+        uploads_playlist_id = playlist_ids.get(watcher.watcher_id)
+        if uploads_playlist_id is None:
+            print(f"Uploads playlist not resolved for: {watcher.watcher_id} - {watcher.name}. "
+                  f"Retry after {UNRESOLVED_RETRY_DELAY}")
+            watcher.next_check_date = now + UNRESOLVED_RETRY_DELAY
+            failed.append(watcher)
+            continue
+
+        watcher.uploads_playlist_id = uploads_playlist_id
+        resolved.append(watcher)
+
+    ContentWatcher.objects.bulk_update(resolved, ["uploads_playlist_id"])
+    ContentWatcher.objects.bulk_update(failed, ["next_check_date"])
+    print(f"Uploads playlist resolved for {len(resolved)}/{len(watchers)} watchers")
+
+
+def run_updates_pipeline(watchers: list[ContentWatcher], concurrency: int, download_workers: int,
+                         feed: YoutubeFeed | None, scheduler: WatcherScheduler | None) -> None:
+    """
+    Check, download, tag and commit stages of different watchers are overlapped
+    :param watchers:
+    :param concurrency: number of watchers checked (API) at the same time
+    :param download_workers: number of watchers downloading at the same time
+    :param feed:
+    :param scheduler:
+    :return:
+    """
+    def on_done(manager: YoutubeWatcherDjangoManager) -> None:
+        # Same as run_watcher: on failure watcher stays due, so it is checked again on next sweep
+        if scheduler and manager.watcher.status == ContentWatcherStatus.FINISHED.value:
+            scheduler.reschedule(manager.watcher)
+
+    pipeline = WatcherPipeline(check_workers=concurrency, download_workers=download_workers, on_done=on_done,
+                               lease=lease, scheduled=scheduler is not None)
+    pipeline.run([YoutubeWatcherDjangoManager(worker, watcher, log_file=paths.YOUTUBE_API_LOG, feed=feed,
+                                              download_pool=download_pool)
+                  for watcher in watchers])
+    for line in pipeline.summary():
+        print(line)
+
+
+def run_imported_watchers(concurrency: int = DEFAULT_CONCURRENCY, timeout: float = DEFAULT_WATCHER_TIMEOUT,
+                          use_feed: bool = True, scheduler: WatcherScheduler = None, use_pipeline: bool = False,
+                          download_workers: int = DEFAULT_DOWNLOAD_WORKERS):
+    """
+    :param concurrency:
+    :param timeout:
+    :param use_feed:
+    :param scheduler: when set, only due watchers are checked, most overdue first. None - check all watchers
+    :param use_pipeline: overlap stages of different watchers, see WatcherPipeline. Timeout is not applied.
+    :param download_workers: number of download workers in pipeline
+    :return:
+    """
+    reclaimed = lease.reclaim_stale()
+    if reclaimed:
+        print(f"Stale running watchers reclaimed: {reclaimed}")
+    prefetch_uploads_playlist_ids()
+    feed = YoutubeFeed() if use_feed else None
+
+    def select(watchers: ContentWatcherQuerySet) -> list[ContentWatcher]:
+        watchers = [watcher for watcher in watchers if not watcher.is_test_object()]
+        if scheduler:
+            all_count = len(watchers)
+            watchers = scheduler.get_due(watchers)
+            print(f"Due watchers: {len(watchers)}/{all_count}")
+        return watchers
+
+    def run_updates(watchers: list[ContentWatcher]):
+        if concurrency > 1:
+            run_updates_concurrent(watchers, concurrency, timeout, feed, scheduler)
+            return
 
-def run_imported_watchers():
-    def run_updates(watchers: ContentWatcherQuerySet):
         for watcher in watchers:
             watcher: ContentWatcher
-            if watcher.is_test_object():
-                continue
 
             # if watcher.watcher_id != "UCwipTluVS2mjuhPtx2WU7eQ":
             #     continue
@@ -26,23 +218,59 @@ def run_imported_watchers():
             # if "Bob" not in watcher.name:
             #     continue
 
-            manager = YoutubeWatcherDjangoManager(worker, watcher, log_file=paths.YOUTUBE_API_LOG)
-            manager.run_updates()
+            run_watcher(watcher, feed, scheduler)
             time.sleep(10)
 
-    run_updates(ContentWatcher.objects.get_passive())
-    run_updates(ContentWatcher.objects.get_active_audio())
-    run_updates(ContentWatcher.objects.get_active_video())
+    groups = [ContentWatcher.objects.get_passive(), ContentWatcher.objects.get_active_audio(),
+              ContentWatcher.objects.get_active_video()]
+    if use_pipeline:
+        # All groups in one pipeline, so checks of passive watchers overlap with downloads of active ones
+        run_updates_pipeline([watcher for group in groups for watcher in select(group)], concurrency,
+                             download_workers, feed, scheduler)
+        return
+
+    for group in groups:
+        run_updates(select(group))
 
 
-def retry_ids():
-    ids = []
-    instances = items_ids_to_objects(ids)
-    for instance in instances:
-        watcher = instance.content_list.content_watcher
-        if watcher:
-            manager = YoutubeWatcherDjangoManager(worker, watcher, log_file=paths.YOUTUBE_API_LOG)
-            manager.retry_items([instance])
+def run_daemon(scheduler: WatcherScheduler, **kwargs) -> None:
+    """
+    Run scheduled sweeps forever. Between sweeps sleeps until the next watcher is due.
+    :param scheduler:
+    :param kwargs: run_imported_watchers arguments
+    """
+    while True:
+        try:
+            run_imported_watchers(scheduler=scheduler, **kwargs)
+        finally:
+            save_api_stats()
+
+        next_due_date = scheduler.get_next_due_date(list(ContentWatcher.objects.all()))
+        sleep = DAEMON_MAX_SLEEP
+        if next_due_date:
+            sleep = (next_due_date - scheduler.now()).total_seconds()
+        sleep = min(max(sleep, DAEMON_MIN_SLEEP), DAEMON_MAX_SLEEP)
+        print(f"{datetime_utils.utcnow()}. Next sweep in {sleep:.0f}s")
+        time.sleep(sleep)
+
+
+def save_api_stats() -> None:
+    """
+    Print the summary of the API calls made by worker, then write them to the trace file and DB
+    :return:
+    """
+    stats = worker.stats
+    for line in stats.summary():
+        print(line)
+
+    stats.write_trace(paths.YOUTUBE_API_TRACE)
+    YoutubeApiCall.objects.bulk_create([
+        YoutubeApiCall(endpoint=record.endpoint, cost=record.cost, latency=record.latency,
+                       response_size=record.response_size, item_count=record.item_count, status=record.status,
+                       watcher_id=record.context or "", called_at=datetime_utils.yt_to_py(record.created_at))
+        for record in stats.records
+    ])
+    stats.clear()
 
 
 def run_json_watchers():
@@ -57,8 +285,69 @@ def run_json_watchers():
 
 
 class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                            help="Number of watchers checked at the same time. 1 - sequential sweep")
+        parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                            help="Max API requests per second, shared by all watchers. 0 - unlimited")
+        parser.add_argument("--timeout", type=float, default=DEFAULT_WATCHER_TIMEOUT,
+                            help="Max seconds a single watcher runs in concurrent sweep. Checked between API "
+                                 "pages and between downloads")
+        parser.add_argument("--no-feed", action="store_true",
+                            help="Don't check channel feeds before the API, always request the API")
+        parser.add_argument("--date-conflict", default=PublishDateConflictPolicy.DEFER.value,
+                            choices=[policy.value for policy in PublishDateConflictPolicy],
+                            help="Date used when publish dates of an item differ. Defer - use main date and save "
+                                 "the conflict for review (see resolve_date_conflicts)")
+        parser.add_argument("--scheduled", action="store_true",
+                            help="Check only watchers which are due by their upload frequency")
+        parser.add_argument("--max-staleness", type=float, default=MAX_STALENESS.total_seconds() / 3600,
+                            help="Max hours between two checks of a scheduled watcher")
+        parser.add_argument("--daemon", action="store_true",
+                            help="Run scheduled sweeps forever, each time only for due watchers")
+        parser.add_argument("--pipeline", action="store_true",
+                            help="Overlap check, download, tag and commit stages of different watchers")
+        parser.add_argument("--watcher-downloads", type=int, default=DEFAULT_WATCHER_DOWNLOADS,
+                            help="Max parallel downloads of a single watcher")
+        parser.add_argument("--global-downloads", type=int, default=DEFAULT_GLOBAL_DOWNLOADS,
+                            help="Max parallel downloads of all watchers")
+        parser.add_argument("--bandwidth", type=int, default=0,
+                            help="Max total download speed, KB/s. 0 - unlimited")
+        parser.add_argument("--split-video", action="store_true",
+                            help="Download video and audio parts separately and merge them after (one video at a time "
+                                 "per watcher), instead of a single yt-dlp run")
+        parser.add_argument("--download-workers", type=int, default=DEFAULT_DOWNLOAD_WORKERS,
+                            help="Number of watchers downloading at the same time in pipeline")
+
     def handle(self, **options):
-        pass
-        # retry_ids()
-        run_imported_watchers()
+        global download_pool
+        download_pool = DownloadPool(env.FFMPEG, watcher_downloads=options["watcher_downloads"],
+                                     global_downloads=options["global_downloads"], bandwidth=options["bandwidth"] * 1024,
+                                     native_merge=not options["split_video"])
+        worker.rate_limiter = RateLimiter(options["rate"])
+        worker.date_conflict_policy = PublishDateConflictPolicy.from_str(options["date_conflict"])
+        scheduler = None
+        if options["scheduled"] or options["daemon"]:
+            scheduler = WatcherScheduler(max_staleness=timedelta(hours=options["max_staleness"]))
+
+        kwargs = {
+            "concurrency": options["concurrency"],
+            "timeout": options["timeout"],
+            "use_feed": not options["no_feed"],
+            "use_pipeline": options["pipeline"],
+            "download_workers": options["download_workers"],
+        }
+        lease.start_heartbeat()
+        try:
+            if options["daemon"]:
+                run_daemon(scheduler, **kwargs)
+                return
+
+            try:
+                run_imported_watchers(scheduler=scheduler, **kwargs)
+            finally:
+                save_api_stats()
+        finally:
+            lease.stop_heartbeat()
+            download_pool.close()
         # run_json_watchers()
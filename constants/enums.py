@@ -90,6 +90,19 @@ class ContentWatcherStatus(EnumChoices):
         return super().value
 
 
+class PublishDateConflictPolicy(EnumChoices):
+    MAIN = "Main"
+    SECONDARY = "Secondary"
+    DEFER = "Defer"
+
+
+class PublishDateConflictSource(EnumChoices):
+    # Playlist item: videoPublishedAt (main) vs snippet.publishedAt (secondary)
+    PLAYLIST = "Playlist"
+    # Republished livestream: API date (main) vs date of the item already in DB (secondary)
+    LIVESTREAM = "Livestream"
+
+
 class VideoQuality(EnumChoices):
     DEFAULT = -1
     Q720 = 720
@@ -38,4 +38,5 @@ NORMALIZATION_PATH = '/'.join([INPUT_FILES_PATH, NORMALIZATION_FILE])
 API_KEY_PATH = '/'.join([INPUT_FILES_PATH, YOUTUBE_DK_FILE])
 
 # LOGS
-YOUTUBE_API_LOG = LOGS_FILES_PATH + "/api_logs.txt"
+YOUTUBE_API_LOG = LOGS_FILES_PATH + "/api_logs.jsonl"
+YOUTUBE_API_TRACE = LOGS_FILES_PATH + "/api_trace.jsonl"
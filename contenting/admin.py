@@ -1,7 +1,8 @@
 from django.contrib import admin
 from import_export.admin import ImportExportModelAdmin
 
-from contenting.models import ContentList, ContentWatcher, ContentItem, ContentMusicItem, ContentTrack
+from contenting.models import ContentList, ContentWatcher, ContentItem, ContentMusicItem, ContentTrack, \
+    YoutubeApiCall, PublishDateConflict
 
 
 @admin.register(ContentList)
@@ -27,3 +28,13 @@ class ContentMusicItemAdmin(ImportExportModelAdmin):
 @admin.register(ContentTrack)
 class ContentTrackAdmin(ImportExportModelAdmin):
     pass
+
+
+@admin.register(YoutubeApiCall)
+class YoutubeApiCallAdmin(ImportExportModelAdmin):
+    pass
+
+
+@admin.register(PublishDateConflict)
+class PublishDateConflictAdmin(ImportExportModelAdmin):
+    pass
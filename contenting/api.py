@@ -193,7 +193,7 @@ class ContentTrackViewSet(MultiSerializerViewSet):
 
 
 class ContentWatcherViewSet(MultiSerializerViewSet):
-    queryset = ContentWatcher.objects.all()
+    queryset = ContentWatcher.objects.select_related("content_list")
     permission_classes = [
         permissions.AllowAny
     ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenting', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contentwatcher',
+            name='uploads_playlist_id',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenting', '0002_contentwatcher_uploads_playlist_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contentwatcher',
+            name='uploads_etag',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+    ]
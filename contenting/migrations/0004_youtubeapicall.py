@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenting', '0003_contentwatcher_uploads_etag'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='YoutubeApiCall',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(max_length=100)),
+                ('cost', models.IntegerField()),
+                ('latency', models.FloatField()),
+                ('response_size', models.IntegerField()),
+                ('item_count', models.IntegerField()),
+                ('status', models.IntegerField()),
+                ('watcher_id', models.CharField(blank=True, default='', max_length=200)),
+                ('called_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 08:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenting', '0004_youtubeapicall'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PublishDateConflict',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_id', models.CharField(max_length=100)),
+                ('title', models.CharField(max_length=500)),
+                ('source', models.CharField(choices=[('Playlist', 'Playlist'), ('Livestream', 'Livestream')], max_length=50)),
+                ('main_date', models.DateTimeField()),
+                ('secondary_date', models.DateTimeField()),
+                ('resolution', models.CharField(blank=True, choices=[('Main', 'Main'), ('Secondary', 'Secondary'), ('Defer', 'Defer')], default='', max_length=50)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('content_watcher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='date_conflicts', to='contenting.contentwatcher')),
+            ],
+        ),
+    ]
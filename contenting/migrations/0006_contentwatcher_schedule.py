@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 08:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenting', '0005_publishdateconflict'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contentwatcher',
+            name='check_interval',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='contentwatcher',
+            name='next_check_date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenting', '0006_contentwatcher_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contentwatcher',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='contentwatcher',
+            name='lease_owner',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2 on 2026-10-18 09:08
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_items(apps, schema_editor):
+    # Same as ContentListQuerySet.recount, with the historical models
+    content_list_model = apps.get_model('contenting', 'ContentList')
+    content_item_model = apps.get_model('contenting', 'ContentItem')
+    content_music_item_model = apps.get_model('contenting', 'ContentMusicItem')
+
+    def count(model, **filters):
+        items = (model.objects.filter(content_list=OuterRef('pk'), **filters).order_by()
+                 .values('content_list').annotate(count=Count('pk')).values('count'))
+        return Coalesce(Subquery(items), Value(0))
+
+    content_list_model.objects.update(
+        items_count=count(content_item_model) + count(content_music_item_model),
+        unconsumed_count=count(content_item_model, consumed=False) + count(content_music_item_model, parsed=False),
+        downloaded_count=(count(content_item_model, download_status='DOWNLOADED')
+                          + count(content_music_item_model, download_status='DOWNLOADED')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenting', '0007_contentwatcher_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contentlist',
+            name='downloaded_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='contentlist',
+            name='items_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='contentlist',
+            name='unconsumed_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_items, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-18 09:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenting', '0008_contentlist_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contentitem',
+            name='download_attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='contentitem',
+            name='download_error',
+            field=models.CharField(blank=True, default='', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='contentitem',
+            name='next_retry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='contentmusicitem',
+            name='download_attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='contentmusicitem',
+            name='download_error',
+            field=models.CharField(blank=True, default='', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='contentmusicitem',
+            name='next_retry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
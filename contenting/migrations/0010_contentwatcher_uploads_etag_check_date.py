@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 09:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenting', '0009_item_download_retry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contentwatcher',
+            name='uploads_etag_check_date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
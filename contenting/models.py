@@ -1,18 +1,20 @@
 from __future__ import annotations
 
+from datetime import datetime, timedelta
 from typing import Self
 
+import pytz
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.db.models import Q, QuerySet
 
 from constants.constants import TEST_OBJ_ANNOTATION
 from constants.enums import ContentCategory, DownloadStatus, ContentItemType, ContentWatcherSourceType, FileExtension, \
-    ContentWatcherStatus, VideoQuality
+    ContentWatcherStatus, VideoQuality, PublishDateConflictPolicy, PublishDateConflictSource
 from contenting.queryset import ContentItemQuerySet, ContentMusicItemQuerySet, ContentListQuerySet, \
-    ContentWatcherQuerySet
+    ContentWatcherQuerySet, PublishDateConflictQuerySet
 from listening.models import Track
-from utils.datetime_utils import default_datetime
+from utils.datetime_utils import default_datetime, utcnow
 from utils.model_utils import PositionedModel
 from utils.string_utils import normalize_file_name
 
@@ -25,17 +27,30 @@ class ContentList(models.Model):
     name = models.CharField(max_length=200)
     category = models.CharField(max_length=50, choices=ContentCategory.as_choices())
     migration_position = models.IntegerField(validators=[MinValueValidator(0)])
+    # Denormalized counters of the list items, kept by contenting.signals and ContentItemAbstractQuerySet.upsert.
+    # Repaired by the recount_content_lists command.
+    items_count = models.IntegerField(default=0)
+    unconsumed_count = models.IntegerField(default=0)
+    downloaded_count = models.IntegerField(default=0)
+
+    COUNTER_FIELDS = ["items_count", "unconsumed_count", "downloaded_count"]
 
     # noinspection PyClassVar
     objects: ContentListQuerySet[ContentList] = ContentListQuerySet.as_manager()
 
+    def save(self, *args, update_fields=None, **kwargs):
+        # Counters are updated in DB (F expressions), values of a loaded instance can be stale. So they are never
+        # written by a save of an existing list, only by the queryset methods.
+        if not self._state.adding and update_fields is None:
+            update_fields = [field.name for field in self._meta.concrete_fields
+                             if not field.primary_key and field.name not in self.COUNTER_FIELDS]
+        super().save(*args, update_fields=update_fields, **kwargs)
+
     def is_music(self):
         return self.category == ContentCategory.MUSIC.value
 
     def is_consumed(self):
-        if self.is_music():
-            return self.content_music_items.is_consumed()
-        return self.content_items.is_consumed()
+        return self.unconsumed_count == 0
 
     def get_content_item(self, content_item_id: str) -> ContentItem | ContentMusicItem | None:
         try:
@@ -44,8 +59,18 @@ class ContentList(models.Model):
         except (ContentItem.DoesNotExist, ContentMusicItem.DoesNotExist):
             return None
 
+    def get_content_items_index(self) -> dict[str, ContentItem | ContentMusicItem]:
+        """
+        Single query. Items have only the fields used for duplicate checks loaded (id, item_id, position, title,
+        published_at), saving them updates only these fields. Manually added items can have blank or repeated
+        item_id, so the index size is not the items count (see get_items_count).
+        :return: item_id -> item. Items with blank item_id are left out
+        """
+        items = (self.content_music_items if self.is_music() else self.content_items).exclude(item_id="")
+        return {item.item_id: item for item in items.only("id", "item_id", "position", "title", "published_at")}
+
     def get_items_count(self):
-        return self.content_items.count() + self.content_music_items.count()
+        return self.items_count
 
     def __str__(self):
         return f'<{self.id}> {self.name}'
@@ -58,6 +83,10 @@ class ContentItemAbstract(PositionedModel):
     file_name = models.CharField(max_length=500, blank=True)
     download_status = models.CharField(max_length=50, choices=DownloadStatus.as_choices())
     published_at = models.DateTimeField()
+    # Failed downloads. Each failure delays the next retry exponentially (see RetryEngine)
+    download_attempts = models.IntegerField(default=0)
+    download_error = models.CharField(default="", max_length=500, blank=True)
+    next_retry_at = models.DateTimeField(null=True, blank=True)
 
     # TODO: probably dont need content_music_items, both can be under abstract class
 
@@ -67,6 +96,89 @@ class ContentItemAbstract(PositionedModel):
     class Meta:
         abstract = True
 
+    # Boolean field which marks the item as consumed. Set by each item model
+    CONSUMED_FIELD: str
+    # Fields which the ContentList counters depend on. Item models add their CONSUMED_FIELD
+    COUNTED_FIELDS = ("content_list", "download_status")
+    # Fields set by a download
+    DOWNLOAD_FIELDS = ["download_status", "download_attempts", "download_error", "next_retry_at"]
+    RETRY_MAX_ATTEMPTS = 8
+    RETRY_BACKOFF_BASE = timedelta(hours=1)
+    RETRY_BACKOFF_MAX = timedelta(days=7)
+
+    def download_failed(self, error: str) -> None:
+        """
+        Status is set to UNABLE and next retry delayed by RETRY_BACKOFF_BASE, doubled on each failure
+        """
+        self.download_status = DownloadStatus.UNABLE.value
+        self.download_attempts += 1
+        self.download_error = error[:self._meta.get_field("download_error").max_length]
+        delay = min(self.RETRY_BACKOFF_BASE * 2 ** (self.download_attempts - 1), self.RETRY_BACKOFF_MAX)
+        self.next_retry_at = datetime.now(pytz.UTC) + delay
+
+    def download_succeeded(self) -> None:
+        """
+        Attempts are kept, as history of the item
+        """
+        self.download_status = DownloadStatus.DOWNLOADED.value
+        self.download_error = ""
+        self.next_retry_at = None
+
+    # Row as loaded from DB (field names, values), see from_db. Counters of the row are computed only on save
+    _loaded_row: tuple[tuple[str, ...], tuple] | None = None
+    # Content list ID and counters of the item, as last saved. Set by contenting.signals and upsert
+    _counted_state: tuple[int, dict[str, int]] | None = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Only references are kept, most loaded items are never saved
+        instance._loaded_row = (field_names, values)
+        return instance
+
+    @classmethod
+    def get_counted_attnames(cls) -> list[str]:
+        return [cls._meta.get_field(name).attname for name in cls.COUNTED_FIELDS]
+
+    @classmethod
+    def count(cls, values: dict) -> dict[str, int]:
+        """
+        :param values: field attname -> value, for each of COUNTED_FIELDS
+        :return: contribution of the item to each ContentList counter
+        """
+        return {
+            "items_count": 1,
+            "unconsumed_count": int(not values[cls.CONSUMED_FIELD]),
+            "downloaded_count": int(values["download_status"] == DownloadStatus.DOWNLOADED.value),
+        }
+
+    def get_counters(self) -> dict[str, int]:
+        return self.count({attname: getattr(self, attname) for attname in self.get_counted_attnames()})
+
+    def get_counted_state(self) -> tuple[int, dict[str, int]] | None:
+        """
+        :return: content list ID and counters of the item. None for unsaved items or items loaded without
+            the counted fields.
+        """
+        deferred = self.get_deferred_fields()
+        if self.pk is None or any(attname in deferred for attname in self.get_counted_attnames()):
+            return None
+        return self.content_list_id, self.get_counters()
+
+    def get_saved_counted_state(self) -> tuple[int, dict[str, int]] | None:
+        """
+        :return: content list ID and counters of the item, as last saved or loaded from DB. None if unknown
+            (item not loaded from DB, or loaded without the counted fields).
+        """
+        if self._counted_state is not None or self._loaded_row is None:
+            return self._counted_state
+
+        values = dict(zip(*self._loaded_row))
+        attnames = self.get_counted_attnames()
+        if any(attname not in values for attname in attnames):
+            return None
+        return values["content_list_id"], self.count(values)
+
     @classmethod
     def build_file_name(cls, position: int, watcher_name: str, title: str):
         return normalize_file_name(" - ".join([str(position), watcher_name, title]))
@@ -74,6 +186,8 @@ class ContentItemAbstract(PositionedModel):
 
 class ContentItem(ContentItemAbstract):
     parent_name = "content_list"
+    CONSUMED_FIELD = "consumed"
+    COUNTED_FIELDS = ContentItemAbstract.COUNTED_FIELDS + (CONSUMED_FIELD,)
 
     consumed = models.BooleanField()
     content_list = models.ForeignKey(ContentList, related_name="content_items", on_delete=models.CASCADE)
@@ -87,6 +201,9 @@ class ContentItem(ContentItemAbstract):
 
 class ContentMusicItem(ContentItemAbstract):
     parent_name = "content_list"
+    # Same as ContentMusicItemQuerySet.filter_not_consumed
+    CONSUMED_FIELD = "parsed"
+    COUNTED_FIELDS = ContentItemAbstract.COUNTED_FIELDS + (CONSUMED_FIELD,)
     tracks: QuerySet[ContentTrack]
 
     type = models.CharField(max_length=50, choices=ContentItemType.as_choices())
@@ -185,6 +302,18 @@ class ContentWatcher(models.Model):
                                       blank=True, null=True)
     video_quality = models.IntegerField(choices=VideoQuality.as_choices())
     content_list = models.OneToOneField(ContentList, related_name="content_watcher", on_delete=models.CASCADE)
+    # Cached ID of the channel "uploads" playlist. Never changes for a channel, so it is resolved only once.
+    uploads_playlist_id = models.CharField(default="", max_length=200, blank=True)
+    # ETag of the uploads playlist first page, received on the last successful check. Sent only while check_date
+    # is the one it was received with, so moving check_date back forces a full check.
+    uploads_etag = models.CharField(default="", max_length=200, blank=True)
+    uploads_etag_check_date = models.DateTimeField(null=True, blank=True)
+    # Set by WatcherScheduler from the upload cadence of the channel. Interval in seconds.
+    check_interval = models.IntegerField(default=0)
+    next_check_date = models.DateTimeField(null=True, blank=True)
+    # Process which runs the watcher, see WatcherLease. Lease is free when expired.
+    lease_owner = models.CharField(default="", max_length=200, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
@@ -201,6 +330,9 @@ class ContentWatcher(models.Model):
     def get_content_item(self, content_item_id: str) -> ContentItem | ContentMusicItem | None:
         return self.content_list.get_content_item(content_item_id)
 
+    def get_content_items_index(self) -> dict[str, ContentItem | ContentMusicItem]:
+        return self.content_list.get_content_items_index()
+
     def is_music(self):
         return self.category == ContentCategory.MUSIC.value
 
@@ -208,7 +340,7 @@ class ContentWatcher(models.Model):
         return self.content_list.migration_position
 
     def get_items_count(self):
-        return self.get_content_items().count() + self.get_content_music_items().count()
+        return self.content_list.get_items_count()
 
     def get_content_items(self):
         return self.content_list.content_items
@@ -219,3 +351,58 @@ class ContentWatcher(models.Model):
     def __str__(self):
         return (f'{self.name}{self.watcher_id} - {self.status} - {self.get_items_count()} - '
                 f'{self.download} - {self.check_date}')
+
+
+class YoutubeApiCall(models.Model):
+    """
+    YouTube Data API request made by the watchers. Latency in seconds, response size in bytes.
+    """
+    endpoint = models.CharField(max_length=100)
+    cost = models.IntegerField()
+    latency = models.FloatField()
+    response_size = models.IntegerField()
+    item_count = models.IntegerField()
+    status = models.IntegerField()
+    watcher_id = models.CharField(default="", max_length=200, blank=True)
+    called_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'<{self.id}> {self.endpoint} - {self.watcher_id} - {self.status} - {self.called_at}'
+
+
+class PublishDateConflict(models.Model):
+    """
+    Publish date conflict deferred by the watchers (see PublishDateConflictPolicy.DEFER).
+    Unresolved while resolution is empty. On resolve, the chosen date is set on the watcher item.
+    """
+    content_watcher = models.ForeignKey(ContentWatcher, related_name="date_conflicts", on_delete=models.CASCADE)
+    item_id = models.CharField(max_length=100)
+    title = models.CharField(max_length=500)
+    source = models.CharField(max_length=50, choices=PublishDateConflictSource.as_choices())
+    main_date = models.DateTimeField()
+    secondary_date = models.DateTimeField()
+    resolution = models.CharField(default="", max_length=50, choices=PublishDateConflictPolicy.as_choices(),
+                                  blank=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # noinspection PyClassVar
+    objects: PublishDateConflictQuerySet[PublishDateConflict] = PublishDateConflictQuerySet.as_manager()
+
+    def resolve(self, resolution: PublishDateConflictPolicy) -> None:
+        if resolution == PublishDateConflictPolicy.DEFER:
+            raise ValueError(f"Conflict can be resolved only with main or secondary date. Conflict: {self}")
+
+        published_at = self.main_date if resolution == PublishDateConflictPolicy.MAIN else self.secondary_date
+        content_list = self.content_watcher.content_list
+        content_list.content_items.filter(item_id=self.item_id).update(published_at=published_at)
+        content_list.content_music_items.filter(item_id=self.item_id).update(published_at=published_at)
+
+        self.resolution = resolution.value
+        self.resolved_at = utcnow()
+        self.save()
+
+    def __str__(self):
+        return (f'<{self.id}> {self.item_id} - {self.source} - {self.main_date} / {self.secondary_date} - '
+                f'{self.resolution}')
@@ -1,13 +1,25 @@
 from __future__ import annotations
 
+from datetime import datetime
 from typing import Self
 
-from django.db.models import Q
+from django.db.models import Q, F, Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 
-from constants.enums import ContentCategory
+from constants.enums import ContentCategory, DownloadStatus
 from utils.model_utils import TypedQuerySet
 
 
+def add_counters(deltas: dict[int, dict[str, int]], content_list_id: int, counters: dict[str, int],
+                 sign: int = 1) -> None:
+    """
+    Accumulate counter changes per content list, to be applied with ContentListQuerySet.apply_counters
+    """
+    list_deltas = deltas.setdefault(content_list_id, {})
+    for name, value in counters.items():
+        list_deltas[name] = list_deltas.get(name, 0) + sign * value
+
+
 class ContentListQuerySet(TypedQuerySet):
     def filter_pure(self, get_pure: bool):
         """
@@ -19,14 +31,114 @@ class ContentListQuerySet(TypedQuerySet):
 
         return self.filter(Q(content_watcher__isnull=True))
 
+    def apply_counters(self, deltas: dict[int, dict[str, int]]) -> None:
+        """
+        Counters are changed with F() expressions, so concurrent changes of the same list are not lost.
+        One query per changed list.
+        :param deltas: content list ID -> counter -> change
+        """
+        for content_list_id, counters in deltas.items():
+            changes = {name: F(name) + value for name, value in counters.items() if value}
+            if changes:
+                self.filter(pk=content_list_id).update(**changes)
+
+    def recount(self) -> int:
+        """
+        Recompute the counters of all lists in the queryset from their items, in a single UPDATE.
+        :return: number of updated lists
+        """
+        # Models import this module
+        from contenting.models import ContentItem, ContentMusicItem
+
+        def count(model, **filters):
+            items = (model.objects.filter(content_list=OuterRef("pk"), **filters).order_by()
+                     .values("content_list").annotate(count=Count("pk")).values("count"))
+            return Coalesce(Subquery(items), Value(0))
+
+        downloaded = DownloadStatus.DOWNLOADED.value
+        return self.update(
+            items_count=count(ContentItem) + count(ContentMusicItem),
+            unconsumed_count=count(ContentItem, consumed=False) + count(ContentMusicItem, parsed=False),
+            downloaded_count=(count(ContentItem, download_status=downloaded)
+                              + count(ContentMusicItem, download_status=downloaded)),
+        )
+
 
 class ContentItemAbstractQuerySet(TypedQuerySet):
+    # Fields set by the watchers. User managed fields (consumed, parsed, type, ...) are never overwritten by upsert.
+    # Position and file_name neither, existing items are never renumbered and keep their downloaded files.
+    UPSERT_FIELDS = ["url", "title", "download_status", "published_at", "download_attempts", "download_error",
+                     "next_retry_at"]
+    # Fields refreshed on saved items received again from the API (ex: check rerun over the same period).
+    # Their download is kept, publish date changes go through the date conflict policy.
+    REFRESH_FIELDS = ["url", "title"]
+    RETRY_STATUSES = [DownloadStatus.UNABLE.value, DownloadStatus.MISSING.value]
+
     def filter_by_content_list(self, content_list_id: int) -> Self:
         if content_list_id is None:
             return self
 
         return self.filter(content_list__pk=content_list_id)
 
+    def filter_retryable(self, max_attempts: int, now: datetime | None) -> Self:
+        """
+        Failed downloads which are due for a retry
+        :param max_attempts: items which failed this many times are given up
+        :param now: None - ignore the backoff, retry all
+        """
+        items = self.filter(download_status__in=self.RETRY_STATUSES, download_attempts__lt=max_attempts)
+        if now is None:
+            return items
+
+        return items.filter(Q(next_retry_at__isnull=True) | Q(next_retry_at__lte=now))
+
+    def upsert(self, items: list, update_fields: list[str] = None) -> tuple[list, list]:
+        """
+        Bulk insert or update items keyed on (content_list, item_id), so saving the same items again is idempotent.
+        Existing items are found with a single query. Should be called inside a transaction.
+        Bulk operations send no signals, so ContentList counters are updated here.
+        :param items: unsaved model instances
+        :param update_fields: fields updated on existing items. Default - UPSERT_FIELDS
+        :return: created items, updated items
+        """
+        if not items:
+            return [], []
+
+        update_fields = update_fields or self.UPSERT_FIELDS
+        existing = {
+            (content_list_id, item_id): (pk, download_status)
+            for pk, content_list_id, item_id, download_status in self.filter(
+                content_list_id__in={item.content_list_id for item in items},
+                item_id__in={item.item_id for item in items if item.item_id},
+            ).values_list("pk", "content_list_id", "item_id", "download_status")
+        }
+
+        created, updated = [], []
+        deltas: dict[int, dict[str, int]] = {}
+        for item in items:
+            pk, download_status = existing.get((item.content_list_id, item.item_id), (None, None)) \
+                if item.item_id else (None, None)
+            if pk is None:
+                created.append(item)
+                add_counters(deltas, item.content_list_id, item.get_counters())
+            else:
+                item.pk = pk
+                updated.append(item)
+                if "download_status" in update_fields:
+                    downloaded = DownloadStatus.DOWNLOADED.value
+                    change = int(item.download_status == downloaded) - int(download_status == downloaded)
+                    add_counters(deltas, item.content_list_id, {"downloaded_count": change})
+
+        self.bulk_create(created)
+        self.bulk_update(updated, update_fields)
+        for item in created:
+            # Same as loaded from DB, so a later save() updates the counters by difference (see contenting.signals)
+            item._counted_state = item.get_counted_state()
+        # Models import this module
+        from contenting.models import ContentList
+        ContentList.objects.apply_counters(deltas)
+        return created, updated
+
 
 class ContentItemQuerySet(ContentItemAbstractQuerySet):
 
@@ -67,3 +179,8 @@ class ContentWatcherQuerySet(TypedQuerySet):
 
     def get_active_video(self) -> Self:
         return self.filter(download=True).exclude(category=ContentCategory.MUSIC.value).order_by('name')
+
+
+class PublishDateConflictQuerySet(TypedQuerySet):
+    def filter_unresolved(self) -> Self:
+        return self.filter(resolution="")
@@ -0,0 +1,112 @@
+import random
+import threading
+import time
+from typing import Callable
+
+# noinspection PyProtectedMember
+from yt_dlp import DownloadError
+
+from constants.enums import FileExtension
+from contenting.reganam_tnetnoc.utils.downloader import YoutubeDownloader
+from contenting.reganam_tnetnoc.watchers.youtube.queue import YoutubeQueue
+
+DEFAULT_WATCHER_DOWNLOADS = 4
+DEFAULT_GLOBAL_DOWNLOADS = 4
+DEFAULT_MAX_TRIES = 3
+BACKOFF_BASE = 3.0  # seconds
+BACKOFF_MAX = 120.0  # seconds
+
+
+class DownloadPool:
+    """
+    Limits shared by all watchers which download at the same time.
+    Downloads of a single watcher are parallel up to watcher_downloads, downloads of all watchers up to
+    global_downloads. Optional bandwidth cap is split between the global download slots.
+    """
+
+    def __init__(self, ffmpeg_location: str, watcher_downloads: int = DEFAULT_WATCHER_DOWNLOADS,
+                 global_downloads: int = DEFAULT_GLOBAL_DOWNLOADS, bandwidth: int = 0,
+                 max_tries: int = DEFAULT_MAX_TRIES, backoff_base: float = BACKOFF_BASE,
+                 backoff_max: float = BACKOFF_MAX, native_merge: bool = True):
+        """
+        :param ffmpeg_location:
+        :param watcher_downloads: max parallel downloads of a single watcher
+        :param global_downloads: max parallel downloads of all watchers
+        :param bandwidth: max total download speed, bytes/sec. 0 - unlimited
+        :param max_tries: tries of each download
+        :param backoff_base: wait (seconds) before the first retry, doubled on each next one
+        :param backoff_max: max wait (seconds) before a retry
+        :param native_merge: see YoutubeDownloader
+        """
+        self.ffmpeg_location = ffmpeg_location
+        self.watcher_downloads = watcher_downloads
+        self.global_downloads = global_downloads
+        self.bandwidth = bandwidth
+        self.max_tries = max_tries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.native_merge = native_merge
+        self.global_slots = threading.BoundedSemaphore(global_downloads)
+        # A YoutubeDownloader (and its YoutubeDL instances) is used by one download at a time and reused by the next
+        # ones. At most one per global slot is created.
+        self.idle_downloaders: list[YoutubeDownloader] = []
+        self.downloaders_lock = threading.Lock()
+
+    def acquire_downloader(self) -> YoutubeDownloader:
+        with self.downloaders_lock:
+            if self.idle_downloaders:
+                return self.idle_downloaders.pop()
+
+        rate_limit = self.bandwidth // self.global_downloads if self.bandwidth else None
+        return YoutubeDownloader(self.ffmpeg_location, rate_limit, self.native_merge)
+
+    def release_downloader(self, downloader: YoutubeDownloader) -> None:
+        with self.downloaders_lock:
+            self.idle_downloaders.append(downloader)
+
+    def close(self) -> None:
+        with self.downloaders_lock:
+            downloaders, self.idle_downloaders = self.idle_downloaders, []
+        for downloader in downloaders:
+            downloader.close()
+
+    def get_watcher_workers(self, file_extension: FileExtension) -> int:
+        # Split video parts are downloaded with fixed temp names in the watcher save location, so only one at a time
+        if file_extension.is_video() and not self.native_merge:
+            return 1
+        return self.watcher_downloads
+
+    def get_backoff(self, attempt: int) -> float:
+        """
+        :param attempt: number of failed tries
+        :return: seconds to wait before next try. Jittered, so parallel retries don't hit at the same time
+        """
+        delay = min(self.backoff_base * 2 ** (attempt - 1), self.backoff_max)
+        return delay * random.uniform(0.5, 1.5)
+
+    def download(self, queue: YoutubeQueue, log: Callable[[str, bool], None]) -> str | None:
+        """
+        A global slot is held only while downloading, not while waiting for a retry.
+        :return: None if download finished without error, else the error of the last try
+        """
+        error = None
+        for attempt in range(1, self.max_tries + 1):
+            try:
+                with self.global_slots:
+                    downloader = self.acquire_downloader()
+                    try:
+                        downloader.download(queue)
+                    finally:
+                        self.release_downloader(downloader)
+                return None
+            except DownloadError as e:
+                error = str(e)
+                if attempt == self.max_tries:
+                    log(f"Unable to download - {queue.url}", True)
+                    break
+
+                delay = self.get_backoff(attempt)
+                log(f"Retry download {attempt + 1}/{self.max_tries} in {delay:.1f}s - {queue.url}", True)
+                time.sleep(delay)
+
+        return error
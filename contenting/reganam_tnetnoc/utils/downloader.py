@@ -1,4 +1,5 @@
 import copy
+from typing import Callable
 
 import yt_dlp as youtube_dl
 
@@ -25,16 +26,69 @@ class YoutubeDownloaderLogger(object):
 
 
 class YoutubeDownloader:
-
-    def __init__(self, ffmpeg_location):
+    """
+    Each URL is extracted once, the info is reused by all the download passes of the item.
+    YoutubeDL instances are created once per options set and reused for all downloads, so a downloader must not be
+    used by two threads at the same time.
+    """
+
+    def __init__(self, ffmpeg_location, rate_limit: int = None, native_merge: bool = True):
+        """
+        :param ffmpeg_location:
+        :param rate_limit: max download speed (bytes/sec) of each download. None - unlimited
+        :param native_merge: video and audio are downloaded in a single yt-dlp run, which merges them straight into
+            the final file. False - audio and video parts are downloaded to fixed temp names and merged after
+        """
         self.ffmpeg_location = ffmpeg_location
+        self.rate_limit = rate_limit
+        self.native_merge = native_merge
         # Stats received after download is finished, from the hook
         self.download_stats = None
+        # Info of the last download, with the selected formats (height, vcodec, ...)
+        self.downloaded_info = None
+        # Options name -> instance
+        self.ydls: dict[str, youtube_dl.YoutubeDL] = {}
 
     def my_hook(self, d):
         if d['status'] == 'finished':
             self.download_stats = d
 
+    def get_ydl(self, name: str, build_options: Callable[[str], dict], output_file_path: str) -> youtube_dl.YoutubeDL:
+        """
+        :param name: name of the options set
+        :param build_options: called only when the instance is created
+        :param output_file_path: output template of the next download
+        :return:
+        """
+        ydl = self.ydls.get(name)
+        if ydl is None:
+            ydl = youtube_dl.YoutubeDL(build_options(output_file_path))
+            self.ydls[name] = ydl
+        else:
+            ydl.params['outtmpl']['default'] = output_file_path
+        return ydl
+
+    @staticmethod
+    def extract(ydl: youtube_dl.YoutubeDL, url: str) -> dict:
+        """
+        Single extraction (page and formats) of the URL. Formats are selected later, by each download pass.
+        """
+        return ydl.extract_info(url, download=False, process=False)
+
+    def download_info(self, ydl: youtube_dl.YoutubeDL, info: dict) -> dict:
+        """
+        Select formats and download from an already extracted info, without requesting the page again
+        :return: stats of the finished download
+        """
+        self.download_stats = None
+        self.downloaded_info = ydl.process_ie_result(copy.deepcopy(info), download=True)
+        return copy.deepcopy(self.download_stats)
+
+    def close(self) -> None:
+        for ydl in self.ydls.values():
+            ydl.close()
+        self.ydls.clear()
+
     def download(self, queue: YoutubeQueue):
         if queue.file_extension.is_audio():
             self.download_audio(queue)
@@ -45,18 +99,10 @@ class YoutubeDownloader:
 
     def download_audio(self, queue: YoutubeQueue):
         output_file_path = queue.save_location + '\\' + queue.file_name + EXT_TAG
-        ydl_opts = self.build_audio_download_options(output_file_path)
-
-        with youtube_dl.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([queue.url])
-
-            # TODO: I forgot what was the purpose of ydl.extract_info(queue.url) and in other functions as well
-            ydl.extract_info(queue.url)
-            queue.audio_dl_stats = copy.deepcopy(self.download_stats)
+        ydl = self.get_ydl("audio", self.build_audio_download_options, output_file_path)
+        queue.audio_dl_stats = self.download_info(ydl, self.extract(ydl, queue.url))
 
     def download_video(self, queue: YoutubeQueue):
-        # Note: audio/video file parts may remain if script ends with error here
-
         # Validate video_quality value
         video_quality = queue.video_quality
         if video_quality and video_quality not in ALLOWED_VIDEO_QUALITY:
@@ -64,25 +110,53 @@ class YoutubeDownloader:
                 f"Video quality option not found in allowed values. Received value: {video_quality}\n"
                 f"Allowed values: {ALLOWED_VIDEO_QUALITY}")
 
+        if self.native_merge:
+            self.download_video_merged(queue)
+        else:
+            self.download_video_parts(queue)
+
+        # Format is selected with video_quality as height ceiling, resize only if no such format was available
+        height = (self.downloaded_info or {}).get("height")
+        if video_quality and video_quality != -1 and (height is None or height > video_quality):
+            print(f"Resizing video file to: {video_quality}. Downloaded height: {height}")
+            Ffmpeg.resize(queue.get_file_abs_path(), height=video_quality, scale_bitrate=True)
+
+    def download_video_merged(self, queue: YoutubeQueue):
+        """
+        Single yt-dlp run: best video and audio formats are downloaded to temp files named after the item and merged
+        by yt-dlp into the final container and path. Safe for parallel downloads in the same folder.
+        """
+        output_file_path = queue.save_location + "\\" + queue.file_name + EXT_TAG
+        ydl = self.get_ydl(f"video_{queue.file_extension.value}_{queue.video_quality}",
+                           lambda path: self.build_video_download_options(path, queue.file_extension,
+                                                                          queue.video_quality),
+                           output_file_path)
+        info = self.extract(ydl, queue.url)
+
+        # Final name has to be known before download, output template is set again with the resolved name
+        queue.replace_file_name_tags(info)
+        ydl.params['outtmpl']['default'] = queue.save_location + "\\" + queue.file_name.replace("%", "%%") + EXT_TAG
+        queue.video_dl_stats = self.download_info(ydl, info)
+
+    def download_video_parts(self, queue: YoutubeQueue):
+        # Note: audio/video file parts may remain if script ends with error here
+
         # Download audio part
         default_audio_name = "audio"
         audio_file = queue.save_location + "\\" + default_audio_name
         output_file_path = audio_file + EXT_TAG
-        ydl_opts = self.build_audio_fragment_download_options(output_file_path)
-        with youtube_dl.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([queue.url])
-            ydl.extract_info(queue.url, download=False)
-            queue.audio_dl_stats = copy.deepcopy(self.download_stats)
+        ydl = self.get_ydl("audio_fragment", self.build_audio_fragment_download_options, output_file_path)
+        info = self.extract(ydl, queue.url)
+        queue.audio_dl_stats = self.download_info(ydl, info)
 
-        # Download video part (has no sound)
+        # Download video part (has no sound), from the same extracted info
         default_video_name = "video"
         video_file = queue.save_location + "\\" + default_video_name
         output_file_path = video_file + EXT_TAG
-        ydl_opts = self.build_video_fragment_download_options(output_file_path)
-        with youtube_dl.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([queue.url])
-            ydl.extract_info(queue.url, download=False)
-            queue.video_dl_stats = copy.deepcopy(self.download_stats)
+        ydl = self.get_ydl(f"video_fragment_{queue.video_quality}",
+                           lambda path: self.build_video_fragment_download_options(path, queue.video_quality),
+                           output_file_path)
+        queue.video_dl_stats = self.download_info(ydl, info)
 
         # Replace tags from file_name by its values from queue.video_dl_stats
         queue.replace_file_name_tags()
@@ -95,18 +169,17 @@ class YoutubeDownloader:
         merged_file = queue.file_name + "." + queue.file_extension.value
         Ffmpeg.merge_audio_and_video(queue.save_location, audio_file, video_file, merged_file)
 
-        if video_quality and video_quality != -1:
-            print(f"Resizing video file to: {video_quality}")
-            Ffmpeg.resize(f"{queue.save_location}\\{merged_file}", height=video_quality, scale_bitrate=True)
-
     def build_common_download_options(self, output_file_path):
-        return {
+        options = {
             'ffmpeg_location': self.ffmpeg_location,
             'outtmpl': output_file_path,
             'logger': YoutubeDownloaderLogger(),
             'progress_hooks': [self.my_hook],
             'cookiefile': YT_COOKIES_FILE
         }
+        if self.rate_limit:
+            options['ratelimit'] = self.rate_limit
+        return options
 
     def build_audio_download_options(self, output_file_path):
         options = self.build_common_download_options(output_file_path)
@@ -127,8 +200,48 @@ class YoutubeDownloader:
                                      {'key': 'FFmpegMetadata'}]
         return options
 
-    def build_video_fragment_download_options(self, output_file_path):
+    @staticmethod
+    def build_video_format(video_quality: int | None, with_audio: bool) -> str:
+        """
+        :param video_quality: max height. None / -1 - best available
+        :param with_audio: video merged with the best audio (m4a can be merged into any video container without
+            re-encoding). False - video only
+        :return: yt-dlp format selector. When no format fits the height, best one is used (and resized after).
+        """
+        audio = "+bestaudio[ext=m4a]/{video}+bestaudio" if with_audio else ""
+        if video_quality and video_quality != -1:
+            limited = f"bestvideo[height<={video_quality}]"
+            selectors = [limited + audio.format(video=limited), f"best[height<={video_quality}]"]
+        else:
+            selectors = []
+        selectors += ["bestvideo" + audio.format(video="bestvideo"), "best"]
+        return "/".join(selectors)
+
+    @staticmethod
+    def build_video_format_sort(video_quality: int | None, file_extension: FileExtension | None) -> list[str]:
+        """
+        Preferences between the formats allowed by the selector: highest height up to video_quality, then h264
+        for mp4 (plays everywhere and needs no re-encode on resize), then bitrate
+        """
+        format_sort = [f"res:{video_quality}"] if video_quality and video_quality != -1 else ["res"]
+        if file_extension == FileExtension.MP4:
+            format_sort.append("vcodec:h264")
+        format_sort.append("br")
+        return format_sort
+
+    def build_video_download_options(self, output_file_path, file_extension: FileExtension, video_quality: int = None):
+        options = self.build_common_download_options(output_file_path)
+        options['format'] = self.build_video_format(video_quality, with_audio=True)
+        options['format_sort'] = self.build_video_format_sort(video_quality, file_extension)
+        options['merge_output_format'] = file_extension.value
+        # Only when a single format (no merge) was downloaded in another container
+        options['postprocessors'] = [{'key': 'FFmpegVideoRemuxer', 'preferedformat': file_extension.value}]
+        options['cachedir'] = False
+        return options
+
+    def build_video_fragment_download_options(self, output_file_path, video_quality: int = None):
         options = self.build_common_download_options(output_file_path)
-        options['format'] = 'bestvideo/best'
+        options['format'] = self.build_video_format(video_quality, with_audio=False)
+        options['format_sort'] = self.build_video_format_sort(video_quality, None)
         options['no-cache-dir'] = True
         return options
@@ -1,14 +1,26 @@
 import json
 import os
 import re
-from typing import Tuple
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import datetime
+from typing import Tuple, Iterator
 
 # noinspection PyPackageRequirements
-import googleapiclient.discovery
+import httplib2
+# noinspection PyPackageRequirements
+from googleapiclient.errors import HttpError
+# noinspection PyPackageRequirements
+from googleapiclient.http import BatchHttpRequest
 
 from constants.constants import DEFAULT_YOUTUBE_WATCH
+from constants.enums import PublishDateConflictPolicy, PublishDateConflictSource
+from contenting.reganam_tnetnoc.watchers.youtube.api_stats import ApiStats, ApiCallRecord, get_quota_cost
 from utils import file
-from utils.datetime_utils import compare_yt_dates, yt_hours_diff
+from utils.datetime_utils import utcnow, yt_to_py
+from utils.rate_limiter import RateLimiter
 from utils.string_utils import normalize_text
 
 # Disable OAuthlib's HTTPS verification when running locally.
@@ -18,67 +30,164 @@ API_SERVICE_NAME = "youtube"
 API_VERSION = "v3"
 
 MAX_RESULTS = 50
+MAX_BATCH_REQUESTS = 10  # requests sent in a single batch HTTP request
 MAX_DURATION = 32400  # 9 hours
+HTTP_TIMEOUT = 60  # seconds
+# Debug only: keep raw API data on items (big memory usage on large scans)
+KEEP_RAW_DATA = False
+
+DURATION_PATTERN = re.compile(r"(\d+)([DHMS])")
+DURATION_UNITS = {"D": 86400, "H": 3600, "M": 60, "S": 1}
+
+
+def parse_yt_date(value: str | None) -> datetime | None:
+    """
+    Fast path of datetime_utils.yt_to_py for the usual API format
+    :param value: UTC date in YouTube format (ex: 2023-10-17T10:00:00Z)
+    :return: timezone aware datetime. None if value is None
+    """
+    if value is None:
+        return None
+
+    try:
+        result = datetime.fromisoformat(value)
+        if result.tzinfo is not None:
+            return result
+    except ValueError:
+        pass
+
+    return yt_to_py(value)
+
+
+def parse_duration_seconds(duration: str) -> int:
+    """
+    :param duration: ISO 8601 duration (ex: P1DT2H3M4S)
+    :return: total seconds
+    """
+    values: dict[str, int] = {}
+    for value, unit in DURATION_PATTERN.findall(duration):
+        values.setdefault(unit, int(value))
+
+    return sum(DURATION_UNITS[unit] * value for unit, value in values.items())
 
 
 class YoutubeAPIPlaylistItem:
-    def __init__(self, data: dict):
-        self.data = data
+    """
+    Only the used fields are extracted from API data, once. Raw data is kept only if keep_data is True (debug).
+    """
+    __slots__ = ("id", "title", "channel_name", "kind", "publish_date", "publish_date_old", "published_at",
+                 "published_at_old", "data")
+
+    def __init__(self, data: dict, keep_data: bool = False):
+        snippet = data.get("snippet", {})
+        resource_id = snippet.get("resourceId", {})
+
+        self.id: str = resource_id.get("videoId")
+        self.kind: str = resource_id.get("kind")
+        self.title: str = snippet.get("title")
+        self.channel_name: str = snippet.get("channelTitle")
+        self.publish_date: str | None = data.get("contentDetails", {}).get("videoPublishedAt")
+        self.publish_date_old: str | None = snippet.get("publishedAt")
+        self.published_at: datetime | None = parse_yt_date(self.publish_date)
+        self.published_at_old: datetime | None = parse_yt_date(self.publish_date_old)
+        self.data: dict | None = data if keep_data else None
         self.replace_title()
 
-    def get_id(self): return self.data.get("snippet").get("resourceId").get("videoId")
+    def get_id(self): return self.id
 
-    def get_channel_name(self): return self.data.get("snippet").get("channelTitle")
+    def get_channel_name(self): return self.channel_name
 
-    def get_title(self): return self.data.get("snippet").get("title")
+    def get_title(self): return self.title
 
-    def set_title(self, new_title: str): self.data["snippet"]["title"] = new_title
+    def set_title(self, new_title: str): self.title = new_title
 
     def replace_title(self): self.set_title(normalize_text(self.get_title()))
 
-    def get_publish_date_old(self) -> str: return self.data.get("snippet", {}).get("publishedAt")
+    def get_publish_date_old(self) -> str: return self.publish_date_old
+
+    def get_publish_date(self) -> str: return self.publish_date
 
-    def get_publish_date(self) -> str: return self.data.get("contentDetails").get("videoPublishedAt")
+    def get_publish_datetime_old(self) -> datetime | None: return self.published_at_old
 
-    def is_video_kind(self): return self.data.get("snippet").get("resourceId").get("kind") == "youtube#video"
+    def get_publish_datetime(self) -> datetime | None: return self.published_at
 
-    def __repr__(self): return f"{self.data.__repr__()}"
+    def use_publish_date_old(self) -> None:
+        self.publish_date = self.publish_date_old
+        self.published_at = self.published_at_old
+
+    def is_video_kind(self): return self.kind == "youtube#video"
+
+    def to_dict(self) -> dict:
+        if self.data is not None:
+            return self.data
+        return {"id": self.id, "kind": self.kind, "title": self.title, "channelTitle": self.channel_name,
+                "videoPublishedAt": self.publish_date, "publishedAt": self.publish_date_old}
+
+    def __repr__(self): return f"{self.to_dict().__repr__()}"
 
 
 class YoutubeAPIVideoItem:
-    def __init__(self, data: dict):
-        self.data = data
+    """
+    Only the used fields are extracted from API data, once. Raw data is kept only if keep_data is True (debug).
+    """
+    __slots__ = ("id", "title", "channel_id", "publish_date", "published_at", "live_broadcast_content",
+                 "duration", "duration_seconds", "data")
+
+    def __init__(self, data: dict, keep_data: bool = False):
+        snippet = data.get("snippet", {})
+
+        self.id: str = data["id"]
+        self.title: str = snippet.get("title")
+        self.channel_id: str = snippet.get("channelId")
+        self.publish_date: str = snippet.get("publishedAt")
+        self.published_at: datetime | None = parse_yt_date(self.publish_date)
+        self.live_broadcast_content: str = snippet.get("liveBroadcastContent")
+        self.duration: str = data.get("contentDetails", {}).get("duration", "")
+        self.duration_seconds: int = parse_duration_seconds(self.duration)
+        self.data: dict | None = data if keep_data else None
         self.replace_title()
 
-    def get_id(self): return self.data["id"]
+    def get_id(self): return self.id
 
-    def get_title(self): return self.data.get("snippet").get("title")
+    def get_title(self): return self.title
 
-    def set_title(self, new_title: str): self.data["snippet"]["title"] = new_title
+    def set_title(self, new_title: str): self.title = new_title
 
     def replace_title(self): self.set_title(normalize_text(self.get_title()))
 
-    def get_publish_date(self) -> str: return self.data.get("snippet").get("publishedAt")
+    def get_publish_date(self) -> str: return self.publish_date
+
+    def get_publish_datetime(self) -> datetime | None: return self.published_at
 
-    def is_livestream(self) -> bool: return self.data["snippet"]["liveBroadcastContent"] == "live"
+    def is_livestream(self) -> bool: return self.live_broadcast_content == "live"
 
-    def is_upcoming(self) -> bool: return self.data["snippet"]["liveBroadcastContent"] == "upcoming"
+    def is_upcoming(self) -> bool: return self.live_broadcast_content == "upcoming"
 
-    def get_channel_id(self) -> str: return self.data["snippet"]["channelId"]
+    def get_channel_id(self) -> str: return self.channel_id
 
-    def get_duration(self) -> str: return self.data["contentDetails"]["duration"]
+    def get_duration(self) -> str: return self.duration
 
-    def __repr__(self): return f"{self.data.__repr__()}"
+    def get_duration_seconds(self) -> int: return self.duration_seconds
+
+    def to_dict(self) -> dict:
+        if self.data is not None:
+            return self.data
+        return {"id": self.id, "title": self.title, "channelId": self.channel_id, "publishedAt": self.publish_date,
+                "liveBroadcastContent": self.live_broadcast_content, "duration": self.duration}
+
+    def __repr__(self): return f"{self.to_dict().__repr__()}"
 
 
 class YoutubeAPIItem:
+    __slots__ = ("playlist_item", "video_item")
+
     def __init__(self, playlist_item: YoutubeAPIPlaylistItem = None, video_item: YoutubeAPIVideoItem = None):
         self.playlist_item = playlist_item
         self.video_item = video_item
 
     @staticmethod
     def sort_by_publish_date(items):
-        return sorted(items, key=lambda k: k.get_publish_date())
+        return sorted(items, key=lambda k: k.get_publish_datetime())
 
     def get_id(self):
         if self.playlist_item:
@@ -120,6 +229,15 @@ class YoutubeAPIItem:
 
         raise Exception(f"No data")
 
+    def get_publish_datetime(self) -> datetime:
+        if self.playlist_item:
+            return self.playlist_item.get_publish_datetime()
+
+        if self.video_item:
+            return self.video_item.get_publish_datetime()
+
+        raise Exception(f"No data")
+
     def is_livestream(self) -> bool:
         if self.video_item:
             return self.video_item.is_livestream()
@@ -158,33 +276,48 @@ class YoutubeAPIItem:
         raise Exception(f"No data")
 
     def get_duration_seconds(self) -> int:
-        duration_str = self.get_duration()
-
-        days = re.search(r"\d*D", duration_str)
-        hours = re.search(r"\d*H", duration_str)
-        minutes = re.search(r"\d*M", duration_str)
-        seconds = re.search(r"\d*S", duration_str)
+        if self.video_item:
+            return self.video_item.get_duration_seconds()
 
-        total_seconds = 0
-        if days:
-            total_seconds += int(days.group()[:-1]) * 86400
-        if hours:
-            total_seconds += int(hours.group()[:-1]) * 3600
-        if minutes:
-            total_seconds += int(minutes.group()[:-1]) * 60
-        if seconds:
-            total_seconds += int(seconds.group()[:-1])
+        raise Exception(f"No data")
 
-        return total_seconds
+    def to_log(self) -> dict:
+        """
+        :return: compact fields for a log record, without the raw API data
+        """
+        fields = {"id": self.get_id(), "title": self.get_title(), "published_at": self.get_publish_date()}
+        if self.video_item:
+            fields["duration"] = self.video_item.get_duration()
+            fields["live"] = self.video_item.live_broadcast_content
+        return fields
 
     def pretty_repr(self):
-        return (f"Playlist data: {json.dumps(self.playlist_item.data, sort_keys=True, indent=2)}.\n"
-                f"Video data: {json.dumps(self.video_item.data, sort_keys=True, indent=2)}")
+        return (f"Playlist data: {json.dumps(self.playlist_item.to_dict(), sort_keys=True, indent=2)}.\n"
+                f"Video data: {json.dumps(self.video_item.to_dict(), sort_keys=True, indent=2)}")
 
     def __repr__(self):
         return f"Playlist data: {self.playlist_item.__repr__()}.\nVideo data: {self.video_item.__repr__()}"
 
 
+class DateConflict:
+    """
+    Publish date conflict of an item, left for later review (see PublishDateConflictPolicy.DEFER)
+    """
+
+    def __init__(self, item_id: str, title: str, source: PublishDateConflictSource, main_date: datetime,
+                 secondary_date: datetime, context: str | None):
+        self.item_id = item_id
+        self.title = title
+        self.source = source
+        self.main_date = main_date
+        self.secondary_date = secondary_date
+        self.context = context
+
+    def __repr__(self):
+        return (f"{self.source.value} conflict: {self.item_id} - {self.title}. "
+                f"Main: {self.main_date} / Secondary: {self.secondary_date}")
+
+
 def merge_items(playlist_items: list[YoutubeAPIPlaylistItem],
                 video_items: list[YoutubeAPIVideoItem]) -> list[YoutubeAPIItem]:
     result: dict[str, YoutubeAPIItem] = {item.get_id(): YoutubeAPIItem(playlist_item=item)
@@ -200,6 +333,11 @@ def merge_items(playlist_items: list[YoutubeAPIPlaylistItem],
     return list(result.values())
 
 
+def enrich_items(playlist_items: list[YoutubeAPIPlaylistItem],
+                 video_items: list[YoutubeAPIVideoItem]) -> list[YoutubeAPIItem]:
+    return filter_items(merge_items(playlist_items, video_items))
+
+
 def filter_items(uploads: list[YoutubeAPIItem]) -> list[YoutubeAPIItem]:
     filtered: list[YoutubeAPIItem] = []
     for item in uploads:
@@ -213,11 +351,184 @@ def filter_items(uploads: list[YoutubeAPIItem]) -> list[YoutubeAPIItem]:
 
 class YoutubeWorker:
 
-    def __init__(self, dk_file: str):
+    def __init__(self, dk_file: str, rate_limiter: RateLimiter = None, http_timeout: int = HTTP_TIMEOUT,
+                 api_root: str = None, keep_raw_data: bool = KEEP_RAW_DATA,
+                 date_conflict_policy: PublishDateConflictPolicy = PublishDateConflictPolicy.DEFER):
+        """
+        :param dk_file: file with the API developer key
+        :param rate_limiter: shared limiter, acquired before each API request. None - no limit
+        :param http_timeout: socket timeout (seconds) of each API request
+        :param api_root: root URL of the API (ex: local stand-in server). None - default YouTube endpoint
+        :param keep_raw_data: keep raw API response on items (debug)
+        :param date_conflict_policy: which date is used when the publish dates of an item differ.
+            DEFER - use main date and keep the conflict for review, see pop_date_conflicts
+        """
+        self.dk_file = dk_file
+        self.api_root = api_root
+        # API client is built on first use, see youtube property
+        self._youtube = None
+        self.build_lock = threading.Lock()
+        self.rate_limiter = rate_limiter
+        self.http_timeout = http_timeout
+        # Disabled after first failed batch, so requests are not sent twice on each call
+        self.use_batch = True
+        # httplib2.Http is not thread-safe, so each thread executes requests with its own instance
+        self.thread_local = threading.local()
+        self.stats = ApiStats()
+        self.keep_raw_data = keep_raw_data
+        self.date_conflict_policy = date_conflict_policy
+        self.date_conflicts: list[DateConflict] = []
+        self.conflicts_lock = threading.Lock()
+
+    @property
+    def youtube(self):
+        """
+        Client is built from the discovery document bundled with googleapiclient (static_discovery),
+        so nothing is fetched from network and commands which don't use the API start without building it.
+        :return: googleapiclient Resource
+        """
+        if self._youtube is None:
+            with self.build_lock:
+                if self._youtube is None:
+                    # Imported here, discovery module is heavy and needed only for building the client
+                    # noinspection PyPackageRequirements
+                    import googleapiclient.discovery
+
+                    dk = file.read(self.dk_file)[0]
+                    client_options = None
+                    if self.api_root:
+                        client_options = {"api_endpoint": self.api_root}
+                    self._youtube = googleapiclient.discovery.build(
+                        API_SERVICE_NAME, API_VERSION, developerKey=dk, static_discovery=True, cache_discovery=False,
+                        client_options=client_options)
+        return self._youtube
+
+    def get_http(self) -> httplib2.Http:
+        http = getattr(self.thread_local, "http", None)
+        if http is None:
+            http = httplib2.Http(timeout=self.http_timeout)
+            self.thread_local.http = http
+        return http
+
+    def set_context(self, context: str | None) -> None:
+        """
+        Context (usually the watcher ID) of the API calls made by current thread. Used for stats only.
+        :param context:
+        :return:
+        """
+        self.thread_local.context = context
+
+    def get_context(self) -> str | None:
+        return getattr(self.thread_local, "context", None)
+
+    def set_deadline(self, deadline: float | None) -> None:
+        """
+        Deadline (time.monotonic) of the uploads requested by current thread. Checked before each playlist page.
+        :param deadline: None - no deadline
+        :return:
+        """
+        self.thread_local.deadline = deadline
 
-        self.dk = file.read(dk_file)[0]
-        self.youtube = googleapiclient.discovery.build(
-            API_SERVICE_NAME, API_VERSION, developerKey=self.dk)
+    def check_deadline(self) -> None:
+        deadline = getattr(self.thread_local, "deadline", None)
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError(f"Deadline exceeded. Context: {self.get_context()}")
+
+    @staticmethod
+    def track_response_size(request) -> dict:
+        """
+        Wrap the response parser of the request, to capture size of the raw response
+        :param request: googleapiclient HttpRequest
+        :return: dict where "response_size" is set when response is received
+        """
+        tracked = {"response_size": 0}
+        postproc = request.postproc
+
+        def tracked_postproc(resp, content):
+            tracked["response_size"] = len(content or b"")
+            return postproc(resp, content)
+
+        request.postproc = tracked_postproc
+        return tracked
+
+    def record_call(self, request, latency: float, status: int, response: dict | None, response_size: int) -> None:
+        endpoint = request.methodId
+        item_count = len(response.get("items", [])) if response else 0
+        self.stats.add(ApiCallRecord(endpoint, get_quota_cost(endpoint), latency, response_size, item_count, status,
+                                     self.get_context(), utcnow()))
+
+    def execute(self, request) -> dict:
+        """
+        Single entry point for all API requests. Applies rate limit and thread-safe http. Each call is recorded
+        in self.stats.
+        :param request: googleapiclient HttpRequest
+        :return: response data
+        """
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+
+        tracked = self.track_response_size(request)
+        status = 0
+        response = None
+        start = time.perf_counter()
+        try:
+            response = request.execute(http=self.get_http())
+            status = 200
+            return response
+        except HttpError as e:
+            status = e.resp.status
+            raise e
+        finally:
+            self.record_call(request, time.perf_counter() - start, status, response, tracked["response_size"])
+
+    def execute_batch(self, requests: list) -> list[dict]:
+        """
+        Send multiple requests in a single batch HTTP request. If batch fails, then failed requests
+        are executed one by one.
+        :param requests: googleapiclient HttpRequest list
+        :return: response data, same order as requests
+        """
+        responses: dict[str, dict] = {}
+
+        if self.use_batch and len(requests) > 1:
+            statuses: dict[str, int] = {}
+
+            def callback(request_id: str, response: dict, exception: Exception):
+                if exception is None:
+                    responses[request_id] = response
+                    statuses[request_id] = 200
+                elif isinstance(exception, HttpError):
+                    statuses[request_id] = exception.resp.status
+
+            if self.api_root:
+                # Batch URI from discovery document ignores the api_endpoint option
+                batch = BatchHttpRequest(callback=callback, batch_uri=urllib.parse.urljoin(self.api_root, "batch"))
+            else:
+                batch = self.youtube.new_batch_http_request(callback=callback)
+            tracked_list = []
+            for i, request in enumerate(requests):
+                if self.rate_limiter:
+                    self.rate_limiter.acquire()
+                tracked_list.append(self.track_response_size(request))
+                batch.add(request, request_id=str(i))
+
+            start = time.perf_counter()
+            try:
+                batch.execute(http=self.get_http())
+            except HttpError as e:
+                print(f"Warning: batch request failed, fallback to single requests. {repr(e)}")
+                self.use_batch = False
+
+            # Batch latency is shared equally by its requests
+            latency = (time.perf_counter() - start) / len(requests)
+            for i, request in enumerate(requests):
+                request_id = str(i)
+                if request_id in statuses:
+                    self.record_call(request, latency, statuses[request_id], responses.get(request_id),
+                                     tracked_list[i]["response_size"])
+
+        return [responses[str(i)] if str(i) in responses else self.execute(request)
+                for i, request in enumerate(requests)]
 
     def get_uploads_playlist_id(self, channel_id: str) -> str:
         """
@@ -229,93 +540,207 @@ class YoutubeWorker:
             part="contentDetails",
             id=channel_id
         )
-        response = request.execute()
-        uploads_id = response.get("items")[0].get("contentDetails").get("relatedPlaylists").get("uploads")
+        response = self.execute(request)
+        items = response.get("items")
+        if not items:
+            raise ValueError(f"Channel not found: {channel_id}")
+        uploads_id = items[0].get("contentDetails").get("relatedPlaylists").get("uploads")
 
         return uploads_id
 
-    def get_uploads(self, channel_id: str, min_date: str, max_date: str = None) -> list[YoutubeAPIItem]:
+    def get_uploads_playlist_ids(self, channel_ids: list[str]) -> dict[str, str]:
+        """
+        Bulk version of get_uploads_playlist_id. Up to MAX_RESULTS channels are resolved by a single request.
+        :param channel_ids: IDs of the YouTube channels
+        :return: channel ID -> ID of its "uploads" playlist. Channels not found are missing from result
+        """
+        result: dict[str, str] = {}
+
+        unique_ids = list(dict.fromkeys(channel_ids))
+        chunks = [unique_ids[i:i + MAX_RESULTS] for i in range(0, len(unique_ids), MAX_RESULTS)]
+        for chunk in chunks:
+            request = self.youtube.channels().list(
+                part="contentDetails",
+                id=",".join(chunk),
+                maxResults=MAX_RESULTS
+            )
+            response = self.execute(request)
+            for item in response.get("items", []):
+                result[item.get("id")] = item.get("contentDetails").get("relatedPlaylists").get("uploads")
+
+        return result
+
+    def get_uploads(self, channel_id: str, min_date: str, max_date: str = None,
+                    uploads_playlist_id: str = None, etag_cache: dict[str, str] = None) -> list[YoutubeAPIItem]:
         """
         :param channel_id:
         :param min_date:
         :param max_date:
+        :param uploads_playlist_id: cached ID of the channel uploads playlist. If None, then it is requested from API
+        :param etag_cache: playlist ID -> ETag of its first page. Mutated with the received ETag.
+            If the first page is not modified, then there are no new uploads. Ignored when max_date is set.
         :return: uploads for given YouTube id in range min_date < yt_date <= max_date (ignore max_date if None)
         """
-        uploads_playlist_id = self.get_uploads_playlist_id(channel_id)
+        # Not streamed, so videos data can be requested in larger batches
+        uploads = list(self.iter_uploads(channel_id, min_date, max_date, uploads_playlist_id, etag_cache,
+                                         batch_size=MAX_RESULTS * MAX_BATCH_REQUESTS))
+
+        # Reverse uploads so it will be ascendent by published_at
+        result = uploads[::-1]
+
+        # Note 2023.10.17: a check to be sure that results are still received in
+        #  chronological order and API is working as usual
+        sorted_uploads = YoutubeAPIItem.sort_by_publish_date(uploads)
+        for i1, i2 in zip(sorted_uploads, result):
+            i1: YoutubeAPIItem
+            i2: YoutubeAPIItem
+            if i1 != i2 and i1.get_publish_datetime() != i2.get_publish_datetime():
+                print("Warning! sort problem", i1, i2)
+
+        return result
+
+    def iter_uploads(self, channel_id: str, min_date: str, max_date: str = None,
+                     uploads_playlist_id: str = None, etag_cache: dict[str, str] = None,
+                     batch_size: int = MAX_RESULTS) -> Iterator[YoutubeAPIItem]:
+        """
+        Streaming version of get_uploads. Items are yielded in API order (descending by published_at),
+        as soon as a batch is enriched with videos data.
+
+        Videos data of a batch is requested in background, while the next playlist page is requested.
+        Memory is bound to ~2 batches, regardless of channel uploads count.
+        :param batch_size: number of items enriched at once
+        :return: same items as get_uploads, but in reversed order
+        """
+        playlist_items = self.iter_playlist_uploads(channel_id, min_date, max_date, uploads_playlist_id, etag_cache)
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="videos") as executor:
+            pending: Tuple[list[YoutubeAPIPlaylistItem], Future] | None = None
+            batch: list[YoutubeAPIPlaylistItem] = []
+            for item in playlist_items:
+                batch.append(item)
+                if len(batch) < batch_size:
+                    continue
+
+                if pending:
+                    yield from enrich_items(pending[0], pending[1].result())
+                pending = (batch, executor.submit(self.get_videos_in_context, [i.get_id() for i in batch],
+                                                  self.get_context()))
+                batch = []
+
+            if pending:
+                yield from enrich_items(pending[0], pending[1].result())
+            if batch:
+                yield from enrich_items(batch, self.get_videos([i.get_id() for i in batch]))
+
+    def iter_playlist_uploads(self, channel_id: str, min_date: str, max_date: str = None,
+                              uploads_playlist_id: str = None, etag_cache: dict[str, str] = None) \
+            -> Iterator[YoutubeAPIPlaylistItem]:
+        """
+        Next playlist page is requested only when all items from previous page are consumed.
+        :return: uploads playlist items in range min_date < yt_date <= max_date (ignore max_date if None)
+        """
+        if not uploads_playlist_id:
+            uploads_playlist_id = self.get_uploads_playlist_id(channel_id)
+
+        if max_date:
+            etag_cache = None
+
+        min_datetime = parse_yt_date(min_date)
+        max_datetime = parse_yt_date(max_date)
 
-        playlist_items: list[YoutubeAPIPlaylistItem] = []
         has_next_page = True
         token = ""
         reached_yt_date = False
         while has_next_page and not reached_yt_date:
-            items, token, has_next_page = self.get_playlist_items(uploads_playlist_id, token)
+            self.check_deadline()
+            items, token, has_next_page = self.get_playlist_items(uploads_playlist_id, token, etag_cache)
 
             for item in items:
-                published_at = item.get_publish_date()
-                published_at_old = item.get_publish_date_old()
+                published_at = item.get_publish_datetime()
+                published_at_old = item.get_publish_datetime_old()
                 if published_at is None:
                     print(f'Warning: ignored video with no publish date {item.get_id()}')
                     continue
 
-                if published_at_old and yt_hours_diff(published_at, published_at_old) > 9.0:
-                    print(f'Warning: publish date differs. Id: {item.get_id()}. Title: {item.get_title()}')
-                    inp_ok = False
-                    inp = None
-                    while not inp_ok:
-                        inp = input(f"Which to use? [M]ain: {published_at} / [S]econdary: {published_at_old} / "
-                                    f"[D]efault\n").upper()
-                        inp_ok = inp in "MSD"
-                    if inp == "S":
-                        published_at = published_at_old
-
-                good_min_date = compare_yt_dates(published_at, min_date) == 1
-                good_max_date = True if not max_date else compare_yt_dates(published_at, max_date) <= 0
+                if published_at_old and abs(published_at - published_at_old).total_seconds() // 3600 > 9:
+                    published_at = self.resolve_date_conflict(item)
+
+                good_min_date = published_at > min_datetime
+                good_max_date = True if not max_datetime else published_at <= max_datetime
                 if good_min_date and good_max_date:
-                    playlist_items.append(item)
+                    yield item
                 elif good_min_date and not good_max_date:
                     continue
                 else:
                     reached_yt_date = True
 
-        video_items = self.get_videos([item.get_id() for item in playlist_items])
-        uploads = merge_items(playlist_items, video_items)
-        uploads = filter_items(uploads)
+    def resolve_date_conflict(self, item: YoutubeAPIPlaylistItem) -> datetime:
+        """
+        Never blocks, the date is chosen by date_conflict_policy.
+        :return: publish date to be used for the item
+        """
+        policy = self.date_conflict_policy
+        print(f'Warning: publish date differs. Id: {item.get_id()}. Title: {item.get_title()}. '
+              f'Main: {item.get_publish_date()} / Secondary: {item.get_publish_date_old()}. Policy: {policy.value}')
 
-        # Reverse uploads so it will be ascendent by published_at
-        result = uploads[::-1]
+        if policy == PublishDateConflictPolicy.SECONDARY:
+            item.use_publish_date_old()
+        elif policy == PublishDateConflictPolicy.DEFER:
+            self.add_date_conflict(DateConflict(item.get_id(), item.get_title(), PublishDateConflictSource.PLAYLIST,
+                                                item.get_publish_datetime(), item.get_publish_datetime_old(),
+                                                self.get_context()))
 
-        # Note 2023.10.17: a check to be sure that results are still received in
-        #  chronological order and API is working as usual
-        sorted_uploads = YoutubeAPIItem.sort_by_publish_date(uploads)
-        for i1, i2 in zip(sorted_uploads, result):
-            i1: YoutubeAPIItem
-            i2: YoutubeAPIItem
-            if i1 != i2 and i1.get_publish_date() != i2.get_publish_date():
-                print("Warning! sort problem", i1, i2)
+        return item.get_publish_datetime()
 
+    def add_date_conflict(self, conflict: DateConflict) -> None:
+        with self.conflicts_lock:
+            self.date_conflicts.append(conflict)
+
+    def pop_date_conflicts(self, context: str | None) -> list[DateConflict]:
+        """
+        :param context: watcher context (see set_context) of the conflicts
+        :return: deferred conflicts of the context. They are removed from the worker.
+        """
+        with self.conflicts_lock:
+            result = [c for c in self.date_conflicts if c.context == context]
+            self.date_conflicts = [c for c in self.date_conflicts if c.context != context]
         return result
 
+    def get_videos_in_context(self, id_list: list[str], context: str | None) -> list[YoutubeAPIVideoItem]:
+        """
+        get_videos for a different thread, with the context of the caller thread
+        """
+        self.set_context(context)
+        return self.get_videos(id_list)
+
     def get_videos(self, id_list: list[str]) -> list[YoutubeAPIVideoItem]:
         items: list[YoutubeAPIVideoItem] = []
 
         # Breaks id_list in arrays with length of MAX_RESULTS
         chunks = [id_list[i:i + MAX_RESULTS] for i in range(0, len(id_list), MAX_RESULTS)]
-        for chunk in chunks:
-            comma_chunk = ",".join(chunk)
-            request = self.youtube.videos().list(
-                part="snippet,liveStreamingDetails,contentDetails",
-                id=comma_chunk
-            )
-            response = request.execute()
-            items += [YoutubeAPIVideoItem(item) for item in response.get('items')]
+        requests = [self.youtube.videos().list(
+            part="snippet,liveStreamingDetails,contentDetails",
+            id=",".join(chunk)
+        ) for chunk in chunks]
+
+        # Up to MAX_BATCH_REQUESTS chunks are sent in one HTTP round-trip
+        for i in range(0, len(requests), MAX_BATCH_REQUESTS):
+            for response in self.execute_batch(requests[i:i + MAX_BATCH_REQUESTS]):
+                items += [YoutubeAPIVideoItem(item, self.keep_raw_data) for item in response.get('items')]
 
         if len(id_list) != len(items):
             print("Warning: not all videos extracted!")
 
         return items
 
-    def get_playlist_items(self, playlist_id: str, page_token: str) \
+    def get_playlist_items(self, playlist_id: str, page_token: str, etag_cache: dict[str, str] = None) \
             -> Tuple[list[YoutubeAPIPlaylistItem], str | None, bool]:
+        """
+        :param playlist_id:
+        :param page_token:
+        :param etag_cache: playlist ID -> ETag of its first page. Used only for the first page, mutated on response.
+        :return: items, next page token, has next page. No items and no next page if first page is not modified
+        """
         # Note 2023.10.17: It seems that results are sorted by "publish date"
 
         request = self.youtube.playlistItems().list(
@@ -324,10 +749,23 @@ class YoutubeWorker:
             maxResults=MAX_RESULTS,
             pageToken=page_token
         )
-        response = request.execute()
+
+        use_etag = etag_cache is not None and not page_token
+        if use_etag and etag_cache.get(playlist_id):
+            request.headers["If-None-Match"] = etag_cache[playlist_id]
+
+        try:
+            response = self.execute(request)
+        except HttpError as e:
+            if use_etag and e.resp.status == 304:
+                return [], None, False
+            raise e
+
+        if use_etag:
+            etag_cache[playlist_id] = response.get("etag")
         token = response.get('nextPageToken')
         has_next_page = True
-        items = [YoutubeAPIPlaylistItem(item) for item in response.get('items')]
+        items = [YoutubeAPIPlaylistItem(item, self.keep_raw_data) for item in response.get('items')]
 
         if not items or not token:
             has_next_page = False
@@ -0,0 +1,111 @@
+import codecs
+import json
+import threading
+
+from utils import file
+
+# Source: https://developers.google.com/youtube/v3/determine_quota_cost
+QUOTA_COSTS = {
+    "youtube.channels.list": 1,
+    "youtube.playlistItems.list": 1,
+    "youtube.videos.list": 1,
+    "youtube.search.list": 100,
+}
+DEFAULT_QUOTA_COST = 1
+DAILY_QUOTA = 10000
+
+
+def get_quota_cost(endpoint: str) -> int:
+    return QUOTA_COSTS.get(endpoint, DEFAULT_QUOTA_COST)
+
+
+class ApiCallRecord:
+    """
+    Single API request. Latency in seconds, response size in bytes.
+    """
+
+    def __init__(self, endpoint: str, cost: int, latency: float, response_size: int, item_count: int,
+                 status: int, context: str, created_at: str):
+        self.endpoint = endpoint
+        self.cost = cost
+        self.latency = latency
+        self.response_size = response_size
+        self.item_count = item_count
+        self.status = status
+        self.context = context
+        self.created_at = created_at
+
+    def to_dict(self) -> dict:
+        return {
+            "endpoint": self.endpoint,
+            "cost": self.cost,
+            "latency": round(self.latency, 4),
+            "response_size": self.response_size,
+            "item_count": self.item_count,
+            "status": self.status,
+            "context": self.context,
+            "created_at": self.created_at,
+        }
+
+
+class ApiStats:
+    """
+    Thread-safe collector of API calls made by a YoutubeWorker.
+    """
+
+    def __init__(self):
+        self.records: list[ApiCallRecord] = []
+        self.lock = threading.Lock()
+
+    def add(self, record: ApiCallRecord) -> None:
+        with self.lock:
+            self.records.append(record)
+
+    def get_units(self) -> int:
+        return sum(record.cost for record in self.records)
+
+    def group_by(self, key: str) -> dict[str, list[ApiCallRecord]]:
+        result: dict[str, list[ApiCallRecord]] = {}
+        for record in self.records:
+            result.setdefault(getattr(record, key), []).append(record)
+        return result
+
+    def summary(self, top: int = 5) -> list[str]:
+        """
+        :param top: number of slowest contexts (watchers) to include
+        :return: lines of the run summary
+        """
+        units = self.get_units()
+        lines = [f"API calls: {len(self.records)} | Units: {units} ({units / DAILY_QUOTA:.1%} of daily quota) | "
+                 f"Items: {sum(r.item_count for r in self.records)} | "
+                 f"Bytes: {sum(r.response_size for r in self.records)} | "
+                 f"Latency: {sum(r.latency for r in self.records):.2f}s"]
+
+        for endpoint, records in sorted(self.group_by("endpoint").items()):
+            latency = sum(r.latency for r in records)
+            lines.append(f"\t{endpoint.ljust(30)} calls: {len(records)} | units: {sum(r.cost for r in records)} | "
+                         f"avg latency: {latency / len(records):.3f}s")
+
+        contexts = self.group_by("context")
+        slowest = sorted(contexts.items(), key=lambda kv: sum(r.latency for r in kv[1]), reverse=True)[:top]
+        for context, records in slowest:
+            lines.append(f"\tSlow: {str(context).ljust(30)} calls: {len(records)} | "
+                         f"latency: {sum(r.latency for r in records):.2f}s")
+
+        return lines
+
+    def write_trace(self, file_path: str) -> None:
+        """
+        Append all records to the file, one JSON per line
+        :param file_path:
+        :return:
+        """
+        if not self.records:
+            return
+
+        with codecs.open(file_path, 'a+', file.ENCODING_UTF8) as trace_file:
+            trace_file.writelines(json.dumps(record.to_dict()) + "\n" for record in self.records)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.records = []
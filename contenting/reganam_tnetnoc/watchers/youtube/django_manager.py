@@ -1,45 +1,71 @@
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 
-# noinspection PyProtectedMember
-from yt_dlp import DownloadError
+import pytz
+from django.db import connection, transaction
+# noinspection PyPackageRequirements
+from googleapiclient.errors import HttpError
 
 from constants import env, paths
-from constants.enums import DownloadStatus, ContentItemType, ContentWatcherStatus
+from constants.enums import DownloadStatus, ContentItemType, ContentWatcherStatus, PublishDateConflictPolicy, \
+    PublishDateConflictSource
 from constants.enums import FileExtension
 from constants.paths import LEGACY_WATCHERS_PATH
-from contenting.models import ContentWatcher, ContentItem, ContentMusicItem
+from contenting.models import ContentWatcher, ContentItem, ContentMusicItem, PublishDateConflict, ContentList
+from contenting.queryset import ContentItemAbstractQuerySet
 from contenting.reganam_tnetnoc.model.file_tags import FileTags
 from contenting.reganam_tnetnoc.model.playlist_item import PlaylistItemList, PlaylistItem
-from contenting.reganam_tnetnoc.utils.downloader import YoutubeDownloader
-from contenting.reganam_tnetnoc.watchers.youtube.api import YoutubeWorker, YoutubeAPIItem
+from contenting.reganam_tnetnoc.utils.download_pool import DownloadPool
+from contenting.reganam_tnetnoc.watchers.youtube.api import YoutubeWorker, YoutubeAPIItem, DateConflict
+from contenting.reganam_tnetnoc.watchers.youtube.feed import YoutubeFeed
 from contenting.reganam_tnetnoc.watchers.youtube.media import YoutubeVideo
 from contenting.reganam_tnetnoc.watchers.youtube.queue import YoutubeQueue
 from contenting.reganam_tnetnoc.watchers.youtube.watcher import YoutubeWatcher
 from utils import datetime_utils, file
 from utils.ffmpeg import Ffmpeg
+from utils.log_sink import get_sink
 
 MODE_UPDATES = "UPDATES"
 MODE_RETRY = "RETRY"
 
 
-def items_ids_to_objects(ids: list[str]):
-    result: list[ContentItem | ContentMusicItem] = []
-    for item_id in ids:
-        try:
-            instance = ContentItem.objects.get(item_id=item_id)
-            result.append(instance)
-            continue
-        except ContentItem.DoesNotExist:
-            pass
+def items_ids_to_objects(ids: list[str]) -> list[ContentItem | ContentMusicItem]:
+    """
+    Two queries for any number of IDs, items come with their content_list and content_watcher.
+    :param ids: item_id of ContentItem or ContentMusicItem. If found in both, ContentItem is used
+    :return: items in order of ids
+    """
+    items_by_id: dict[str, list[ContentItem | ContentMusicItem]] = {}
+    for model in (ContentMusicItem, ContentItem):
+        found: dict[str, list[ContentItem | ContentMusicItem]] = {}
+        for item in model.objects.filter(item_id__in=ids).select_related("content_list__content_watcher"):
+            found.setdefault(item.item_id, []).append(item)
+        items_by_id.update(found)
+
+    missing = [item_id for item_id in ids if item_id not in items_by_id]
+    if missing:
+        raise KeyError(f"{missing} does not exist")
+
+    return [item for item_id in dict.fromkeys(ids) for item in items_by_id[item_id]]
 
+
+def group_by_watcher(items: list[ContentItem | ContentMusicItem]) \
+        -> list[tuple[ContentWatcher, list[ContentItem | ContentMusicItem]]]:
+    """
+    Items of lists without a watcher are ignored
+    :return: watcher, its items
+    """
+    groups: dict[int, tuple[ContentWatcher, list[ContentItem | ContentMusicItem]]] = {}
+    for item in items:
         try:
-            instance = ContentMusicItem.objects.get(item_id=item_id)
-            result.append(instance)
+            watcher = item.content_list.content_watcher
+        except ContentWatcher.DoesNotExist:
             continue
-        except ContentItem.DoesNotExist:
-            raise KeyError(f"{item_id} does not exist")
 
-    return result
+        groups.setdefault(watcher.pk, (watcher, []))[1].append(item)
+
+    return list(groups.values())
 
 
 # TODO: https://channels.readthedocs.io/en/stable/tutorial/part_1.html
@@ -49,19 +75,42 @@ class YoutubeWatcherDjangoManager:
     Manager for keeping YouTube channels up to date by using django models and database
     """
 
-    def __init__(self, api_worker: YoutubeWorker, watcher: ContentWatcher, log_file: str = None):
+    def __init__(self, api_worker: YoutubeWorker, watcher: ContentWatcher, log_file: str = None,
+                 feed: YoutubeFeed = None, download_pool: DownloadPool = None, deadline: float = None):
         self.log_file = log_file
         self.api: YoutubeWorker = api_worker
         self.watcher: ContentWatcher = watcher
-
-        self.downloader = YoutubeDownloader(env.FFMPEG)
+        # When set, channel feed is checked first and API is requested only if feed has something new
+        self.feed: YoutubeFeed | None = feed
+        # Uploads playlist ID -> ETag of its first page, received during current check
+        self.etag_cache: dict[str, str] = {}
+        # ETag sent for the uploads first page during current check. Empty - sent without If-None-Match
+        self.sent_etag: str = ""
+        # Publish date conflicts deferred during current check, saved for review together with the new items
+        self.date_conflicts: list[DateConflict] = []
+        # Saved items whose publish date is replaced during current check (MAIN policy), saved with the new items
+        self.date_updates: list[ContentItem | ContentMusicItem] = []
+        # Uploads already saved in the list (ex: check rerun over the same period), refreshed with the new items
+        self.saved_uploads: list[ContentItem | ContentMusicItem] = []
+        # Set when the check starts, becomes the watcher check_date when the update is committed
+        self.new_check_date: str | None = None
+        # time.monotonic after which the update is stopped, checked between API pages and between downloads.
+        # Running request or download is not interrupted. None - no deadline
+        self.deadline: float | None = deadline
+
+        self.download_pool: DownloadPool = download_pool or DownloadPool(env.FFMPEG)
         self.save_location: str = "\\".join([paths.WATCHERS_DOWNLOAD_PATH, self.watcher.name])
 
-    def log(self, message, console_print: bool = False) -> None:
+    def log(self, message, console_print: bool = False, **fields) -> None:
+        """
+        :param message:
+        :param console_print: message is printed as well. Only for lines worth watching live.
+        :param fields: extra JSON fields of the log record
+        """
         if self.log_file is None:
             print(message)
         else:
-            file.append(self.log_file, message)
+            get_sink(self.log_file).write(message, watcher=self.watcher.name, **fields)
             if console_print:
                 print(message)
 
@@ -70,39 +119,163 @@ class YoutubeWatcherDjangoManager:
                                            ContentWatcherStatus.IGNORE.value, ContentWatcherStatus.RUNNING.value)
 
     def run_updates(self) -> None:
+        """
+        All stages of the update, one after another. See WatcherPipeline to overlap stages of multiple watchers.
+        """
+        new_content_items = self.check_updates()
+        if new_content_items is None:
+            return
+
+        try:
+            self.download_updates(new_content_items)
+            self.tag_updates(new_content_items)
+            self.commit_updates(new_content_items)
+        except Exception as e:
+            self.fail()
+            raise e
+
+    def check_updates(self) -> list[ContentItem | ContentMusicItem] | None:
+        """
+        First stage of the update. Watcher is left RUNNING until commit_updates or fail.
+        :return: new items (not saved yet). None if watcher is unavailable or has nothing new (already finished)
+        """
         if not self.is_watcher_available():
             self.log(f"Watcher <{self.watcher.name}> is unavailable. Status: {self.watcher.status}", True)
-            return
+            return None
 
+        self.api.set_context(self.watcher.watcher_id)
+        self.api.set_deadline(self.deadline)
         try:
             self.watcher.status = ContentWatcherStatus.RUNNING.value
             self.watcher.save()
 
-            new_check_date = datetime_utils.utcnow()
+            self.new_check_date = datetime_utils.utcnow()
             check_date = datetime_utils.py_to_yt(self.watcher.check_date)
 
-            self.log(f'{new_check_date}. '
+            self.log(f'{self.new_check_date}. '
                      f'Checking: {self.watcher.watcher_id} - {self.watcher.name}', True)
             # TODO: if new_check_date - check_date < 12 hours, get user prompt if to make check again
-            new_yt_uploads = self.api.get_uploads(self.watcher.watcher_id, check_date)
+            if self.feed and not self.feed.has_new_uploads(self.watcher.watcher_id, self.watcher.check_date):
+                # check_date is not moved, so the next API check still covers this period in case the feed is late
+                self.log(f"{self.watcher.name.ljust(30)} || No new uploads in feed", True)
+                self.watcher.status = ContentWatcherStatus.FINISHED.value
+                self.watcher.save()
+                return None
+
+            try:
+                new_yt_uploads = self.get_uploads(check_date)
+            finally:
+                # Also on failure, so conflicts are not left in the worker. A failed check finds them again next time
+                date_conflicts = self.api.pop_date_conflicts(self.watcher.watcher_id)
+            self.date_conflicts = date_conflicts
+            if self.is_uploads_not_modified(new_yt_uploads):
+                self.log(f"{self.watcher.name.ljust(30)} || Uploads not modified", True)
+                self.finish_not_modified()
+                return None
+
             self.log(f"{self.watcher.name.ljust(30)} || New uploads - {len(new_yt_uploads)}", True)
 
-            new_content_items = self.process_new_uploads(new_yt_uploads)
-            if self.watcher.download:
-                self.download_pending(new_content_items)
-                self.append_tags(new_content_items)
+            return self.process_new_uploads(new_yt_uploads)
+        except Exception as e:
+            self.fail()
+            raise e
+        finally:
+            self.api.set_context(None)
+            self.api.set_deadline(None)
+
+    def download_updates(self, new_content_items: list[ContentItem | ContentMusicItem]) -> None:
+        if self.watcher.download:
+            self.download_pending(new_content_items)
+
+    def tag_updates(self, new_content_items: list[ContentItem | ContentMusicItem]) -> None:
+        if self.watcher.download:
+            self.append_tags(new_content_items)
 
-                self.temp_old_func(new_content_items, MODE_UPDATES, new_check_date)
+            self.temp_old_func(new_content_items, MODE_UPDATES, self.new_check_date)
 
-            for content_item in new_content_items:
-                content_item.save()
-            self.watcher.check_date = new_check_date
+    def commit_updates(self, new_content_items: list[ContentItem | ContentMusicItem]) -> None:
+        """
+        Last stage of the update. New items, already saved uploads, livestream date updates, deferred date conflicts
+        and the watcher are saved in one transaction, so a list is never left half-written. Items are upserted, so
+        committing the same items again is idempotent.
+        """
+        items_model = ContentMusicItem if self.watcher.is_music() else ContentItem
+        with transaction.atomic():
+            created, updated = items_model.objects.upsert(new_content_items)
+            items_model.objects.upsert(self.saved_uploads, update_fields=ContentItemAbstractQuerySet.REFRESH_FIELDS)
+            self.save_date_updates(items_model)
+            self.save_date_conflicts()
+            self.watcher.uploads_etag = self.etag_cache.get(self.watcher.uploads_playlist_id) or ""
+            self.watcher.uploads_etag_check_date = self.new_check_date
+            self.watcher.check_date = self.new_check_date
             self.watcher.status = ContentWatcherStatus.FINISHED.value
             self.watcher.save()
-        except Exception as e:
-            self.watcher.status = ContentWatcherStatus.ERROR.value
-            self.watcher.save()
-            raise e
+
+        # Counters are updated in DB by the upsert
+        self.watcher.content_list.refresh_from_db(fields=ContentList.COUNTER_FIELDS)
+        if updated:
+            self.log(f"{self.watcher.name.ljust(30)} || Items already saved, updated - {len(updated)}", True)
+
+    def is_uploads_not_modified(self, new_yt_uploads: list[YoutubeAPIItem]) -> bool:
+        """
+        On 304 the sent ETag is left in self.etag_cache, on 200 it is replaced by the received one
+        """
+        received_etag = self.etag_cache.get(self.watcher.uploads_playlist_id)
+        return not new_yt_uploads and bool(self.sent_etag) and received_etag == self.sent_etag
+
+    def finish_not_modified(self) -> None:
+        """
+        Nothing to process or commit, only the check date is moved (together with the date of the kept ETag)
+        """
+        self.watcher.check_date = self.new_check_date
+        self.watcher.uploads_etag_check_date = self.new_check_date
+        self.watcher.status = ContentWatcherStatus.FINISHED.value
+        self.watcher.save(update_fields=["check_date", "uploads_etag_check_date", "status"])
+
+    def check_deadline(self) -> None:
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise TimeoutError(f"Watcher <{self.watcher.name}> exceeded its deadline")
+
+    def fail(self) -> None:
+        self.watcher.status = ContentWatcherStatus.ERROR.value
+        self.watcher.save()
+
+    def get_uploads_playlist_id(self, forced: bool = False) -> str:
+        """
+        Uploads playlist ID is cached on the watcher, so the API is requested only first time or when forced.
+        :param forced: ignore cached value and request it again from API
+        :return:
+        """
+        if forced or not self.watcher.uploads_playlist_id:
+            self.watcher.uploads_playlist_id = self.api.get_uploads_playlist_id(self.watcher.watcher_id)
+            self.watcher.save(update_fields=["uploads_playlist_id"])
+
+        return self.watcher.uploads_playlist_id
+
+    def get_uploads(self, min_date: str, max_date: str = None) -> list[YoutubeAPIItem]:
+        """
+        ETag received for the uploads first page is kept in self.etag_cache. It is set on the watcher
+        only when the whole check is finished, so a failed check is never skipped by the next one.
+        The stored ETag is sent only if check_date was not changed since it was received.
+        """
+        uploads_playlist_id = self.get_uploads_playlist_id()
+        etag_valid = self.watcher.uploads_etag_check_date == self.watcher.check_date
+        self.sent_etag = self.watcher.uploads_etag if etag_valid and not max_date else ""
+        self.etag_cache = {uploads_playlist_id: self.sent_etag}
+        try:
+            return self.api.get_uploads(self.watcher.watcher_id, min_date, max_date, uploads_playlist_id,
+                                        self.etag_cache)
+        except HttpError as e:
+            if e.resp.status != 404:
+                raise e
+
+        # Cached playlist not found, refresh it from API and try once again
+        self.log(f"Uploads playlist not found: {uploads_playlist_id}. Refreshing for: {self.watcher.name}", True)
+        uploads_playlist_id = self.get_uploads_playlist_id(forced=True)
+        self.sent_etag = ""
+        self.etag_cache = {}
+        return self.api.get_uploads(self.watcher.watcher_id, min_date, max_date, uploads_playlist_id,
+                                    self.etag_cache)
 
     def temp_old_func(self, items: list[ContentItem | ContentMusicItem], mode: str, check_date: str = ""):
         """
@@ -202,9 +375,15 @@ class YoutubeWatcherDjangoManager:
         # TODO: implement
         ...
 
-    def retry_unables(self):
-        # TODO: implement
-        ...
+    def retry_unables(self, max_attempts: int = ContentItem.RETRY_MAX_ATTEMPTS, force: bool = False):
+        """
+        Retry failed downloads (UNABLE / MISSING) of the watcher which are due by their backoff
+        :param max_attempts: items which failed this many times are not retried
+        :param force: ignore the backoff
+        """
+        items = self.watcher.get_content_music_items() if self.watcher.is_music() else self.watcher.get_content_items()
+        now = None if force else datetime.now(pytz.UTC)
+        self.retry_items(list(items.filter_retryable(max_attempts, now).order_by("position")))
 
     def retry_items(self, items: list[ContentItem | ContentMusicItem]):
         if not self.watcher.download:
@@ -231,12 +410,20 @@ class YoutubeWatcherDjangoManager:
             content_item.save()
 
     def process_new_uploads(self, new_yt_uploads: list[YoutubeAPIItem]) -> list[ContentItem | ContentMusicItem]:
+        """
+        Existing items of the list are loaded once (see get_content_items_index), all duplicate checks are in memory.
+        New positions follow the list items counter, the index is keyed by item_id which can be blank or repeated
+        for manually added items.
+        """
+        if not new_yt_uploads:
+            return []
+
+        db_items_index = self.watcher.get_content_items_index()
         items_count = self.watcher.get_items_count()
         result: list[ContentItem | ContentMusicItem] = []
         ids_set = set()
         for api_video in new_yt_uploads:
-            self.log("\t" + repr(api_video))
-            print(f"{api_video.get_publish_date()} | {api_video.get_id()} | {api_video.get_title()}")
+            self.log("New upload", **api_video.to_log())
 
             items_count += 1
             if self.watcher.is_music():
@@ -244,7 +431,7 @@ class YoutubeWatcherDjangoManager:
             else:
                 content_item = self.new_content_item(api_video, items_count)
 
-            db_content_item = self.watcher.get_content_item(content_item.item_id)
+            db_content_item = db_items_index.get(content_item.item_id)
             if db_content_item:
                 # This is usually for livestreams.
                 # When downloading a livestream after it is finished, it has one publish date.
@@ -255,16 +442,17 @@ class YoutubeWatcherDjangoManager:
                 if (db_content_item.position + 1 == content_item.position
                         and db_content_item.title == content_item.title):
                     if db_content_item.published_at != content_item.published_at:
-                        inp = input(f"Sync new publish date? DB: {db_content_item.published_at} | "
-                                    f"API: {content_item.published_at} | Y/N")
-                        if inp in "Yy":
-                            db_content_item.published_at = content_item.published_at
-                            db_content_item.save()
-                            items_count -= 1
-                            continue
-
-                raise ValueError(f"Content item with id: {db_content_item.item_id} already exists. "
-                                 f"DB Item: {str(db_content_item)}")
+                        self.resolve_livestream_date_conflict(db_content_item, content_item)
+                        items_count -= 1
+                        continue
+
+                # Already saved, ex: check rerun over the same period. Not downloaded again, keeps its position
+                self.log(f"Item already saved: {content_item.item_id}", item_id=content_item.item_id,
+                         position=db_content_item.position)
+                items_count -= 1
+                content_item.position = db_content_item.position
+                self.saved_uploads.append(content_item)
+                continue
 
             if content_item.item_id in ids_set:
                 raise ValueError(f"Item {content_item.item_id} is already in list. Item: {str(content_item)}")
@@ -272,13 +460,54 @@ class YoutubeWatcherDjangoManager:
                 ids_set.add(content_item.item_id)
 
             if content_item.download_status == DownloadStatus.SKIP.value:
-                self.log(f"Video skipped: {api_video.get_id()}", True)
-                print(f"Api data: {api_video}")
+                self.log(f"Video skipped: {api_video.get_id()}", True, **api_video.to_log())
 
             result.append(content_item)
 
         return result
 
+    def resolve_livestream_date_conflict(self, db_content_item: ContentItem | ContentMusicItem,
+                                         content_item: ContentItem | ContentMusicItem) -> None:
+        """
+        Never blocks. API date is main, DB date is secondary. Policy is the same as for the API worker.
+        :param db_content_item: item already saved in DB
+        :param content_item: same item, received again from API
+        :return:
+        """
+        policy: PublishDateConflictPolicy = self.api.date_conflict_policy
+        self.log(f"Livestream publish date differs: {db_content_item.item_id}. DB: {db_content_item.published_at} | "
+                 f"API: {content_item.published_at}. Policy: {policy.value}", True)
+
+        if policy == PublishDateConflictPolicy.MAIN:
+            # Saved in commit_updates, together with the new items
+            db_content_item.published_at = content_item.published_at
+            self.date_updates.append(db_content_item)
+        elif policy == PublishDateConflictPolicy.DEFER:
+            self.date_conflicts.append(DateConflict(content_item.item_id, content_item.title,
+                                                    PublishDateConflictSource.LIVESTREAM, content_item.published_at,
+                                                    db_content_item.published_at, self.watcher.watcher_id))
+
+    def save_date_updates(self, items_model: type[ContentItem | ContentMusicItem]) -> None:
+        if not self.date_updates:
+            return
+
+        items_model.objects.bulk_update(self.date_updates, ["published_at"])
+        self.log(f"{self.watcher.name.ljust(30)} || Livestream dates updated - {len(self.date_updates)}", True)
+        self.date_updates = []
+
+    def save_date_conflicts(self) -> None:
+        if not self.date_conflicts:
+            return
+
+        PublishDateConflict.objects.bulk_create([
+            PublishDateConflict(content_watcher=self.watcher, item_id=conflict.item_id, title=conflict.title,
+                                source=conflict.source.value, main_date=conflict.main_date,
+                                secondary_date=conflict.secondary_date)
+            for conflict in self.date_conflicts
+        ])
+        self.log(f"{self.watcher.name.ljust(30)} || Date conflicts deferred - {len(self.date_conflicts)}", True)
+        self.date_conflicts = []
+
     def new_content_item(self, yt_api_item: YoutubeAPIItem, position: int) -> ContentItem:
         content_item = ContentItem()
         self.set_content_item_common_fields(content_item, yt_api_item, position)
@@ -300,7 +529,7 @@ class YoutubeWatcherDjangoManager:
         content_item.file_name = ""
         content_item.position = position
         content_item.download_status = DownloadStatus.NONE.value
-        content_item.published_at = datetime_utils.yt_to_py(yt_api_item.get_publish_date())
+        content_item.published_at = yt_api_item.get_publish_datetime()
         content_item.content_list = self.watcher.content_list
 
         if self.watcher.download:
@@ -308,42 +537,62 @@ class YoutubeWatcherDjangoManager:
             skip = not yt_api_item.has_valid_duration()
             content_item.download_status = DownloadStatus.SKIP.value if skip else DownloadStatus.PENDING.value
 
-    # noinspection DuplicatedCode
     def download_pending(self, content_items: list[ContentItem | ContentMusicItem]):
+        """
+        Items are downloaded in parallel, within the limits of self.download_pool
+        """
         q_len = str(len(content_items))
-        for i, content_item in enumerate(content_items, start=1):
-            q_progress = f"{i}/{q_len}"
-
+        workers = self.download_pool.get_watcher_workers(FileExtension.from_str(self.watcher.file_extension))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="download") as executor:
+            futures = [executor.submit(self.download_item, content_item, f"{i}/{q_len}")
+                       for i, content_item in enumerate(content_items, start=1)]
+            for future in futures:
+                future.result()
+
+    def download_item(self, content_item: ContentItem | ContentMusicItem, q_progress: str) -> None:
+        try:
             if content_item.download_status != DownloadStatus.PENDING.value:
                 self.log(f"Queue ignored, item status {content_item.download_status} / {q_progress}", True)
-                continue
+                return
+
+            # Raised in each queued item, so the update fails after the downloads already started
+            self.check_deadline()
 
             queue = self.new_queue(content_item)
             result_file = queue.get_file_abs_path()
 
-            max_tries = 3
+            error = None
             if file.exists(result_file):
                 self.log(f"Queue ignored, file exist: {q_progress}", True)
             else:
                 self.log(f"Process queue: {q_progress} - {result_file}", True)
-
-                current_try = 1
-                while current_try <= max_tries:
-                    try:
-                        self.downloader.download(queue)
-                        break
-                    except DownloadError:
-                        current_try += 1
-                        if current_try <= max_tries:
-                            self.log(f"Retry download {current_try}/{max_tries} - {queue.url}", True)
-                            time.sleep(3)
-                        else:
-                            self.log(f"Unable to download - {queue.url}", True)
+                self.set_download_status(content_item, DownloadStatus.DOWNLOADING)
+                error = self.download_pool.download(queue, self.log)
 
             if file.exists(result_file):
-                content_item.download_status = DownloadStatus.DOWNLOADED.value
+                content_item.download_succeeded()
             else:
-                content_item.download_status = DownloadStatus.UNABLE.value
+                content_item.download_failed(error or f"File not found after download: {result_file}")
+                self.log("Download failed", item_id=content_item.item_id, attempts=content_item.download_attempts,
+                         error=content_item.download_error)
+            self.save_download_result(content_item)
+        finally:
+            # Executed in a download thread, which has its own DB connection
+            connection.close()
+
+    @staticmethod
+    def set_download_status(content_item: ContentItem | ContentMusicItem, status: DownloadStatus) -> None:
+        """
+        Status is saved right away only for items which are already in DB (ex: retry)
+        """
+        content_item.download_status = status.value
+        if content_item.pk:
+            content_item.save(update_fields=["download_status"])
+
+    @staticmethod
+    def save_download_result(content_item: ContentItem | ContentMusicItem) -> None:
+        if content_item.pk:
+            content_item.save(update_fields=content_item.DOWNLOAD_FIELDS)
 
     def new_queue(self, content_item: ContentItem | ContentMusicItem) -> YoutubeQueue:
         queue = YoutubeQueue(
@@ -0,0 +1,254 @@
+import hashlib
+import json
+import threading
+import urllib.parse
+from datetime import datetime, timedelta
+from email.parser import BytesParser
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from utils.datetime_utils import py_to_yt
+
+SERVICE_PATH = "/youtube/v3/"
+BATCH_PATH = "/batch"
+FEED_PATH = "/feeds/videos.xml"
+BOUNDARY = "fake_batch_boundary"
+
+DEFAULT_MAX_RESULTS = 5
+UPLOAD_INTERVAL = timedelta(hours=1)
+
+
+class FakeYoutubeData:
+    """
+    Synthetic channels for the fake YouTube Data API. Nothing is stored, items are generated on request.
+
+    Channel i has uploads count videos. Video 0 is the newest, each next one is UPLOAD_INTERVAL older.
+    """
+
+    def __init__(self, channels: int, uploads: int, newest_date: datetime = None):
+        self.channels = channels
+        self.uploads = uploads
+        self.newest_date = newest_date or datetime.utcnow().replace(microsecond=0)
+
+    @staticmethod
+    def channel_id(index: int) -> str:
+        return f"UCfake{index:06d}"
+
+    @staticmethod
+    def playlist_id(index: int) -> str:
+        return f"UUfake{index:06d}"
+
+    @staticmethod
+    def video_id(channel_index: int, video_index: int) -> str:
+        return f"v{channel_index:06d}x{video_index:07d}"
+
+    @staticmethod
+    def parse_index(value: str, prefix_len: int) -> int | None:
+        try:
+            return int(value[prefix_len:])
+        except ValueError:
+            return None
+
+    def is_channel(self, index: int | None) -> bool:
+        return index is not None and 0 <= index < self.channels
+
+    def published_at(self, video_index: int) -> str:
+        return py_to_yt(self.newest_date - UPLOAD_INTERVAL * video_index)
+
+    def channels_list(self, ids: list[str]) -> dict:
+        items = []
+        for channel_id in ids:
+            index = self.parse_index(channel_id, 6)
+            if self.is_channel(index):
+                items.append({
+                    "kind": "youtube#channel",
+                    "id": channel_id,
+                    "contentDetails": {"relatedPlaylists": {"uploads": self.playlist_id(index)}},
+                })
+        return {"kind": "youtube#channelListResponse", "items": items}
+
+    def playlist_items_list(self, playlist_id: str, page_token: str, max_results: int) -> dict | None:
+        """
+        :return: None if playlist not found
+        """
+        index = self.parse_index(playlist_id, 6)
+        if not self.is_channel(index):
+            return None
+
+        start = int(page_token) if page_token else 0
+        end = min(start + max_results, self.uploads)
+        items = []
+        for video_index in range(start, end):
+            published_at = self.published_at(video_index)
+            items.append({
+                "kind": "youtube#playlistItem",
+                "snippet": {
+                    "publishedAt": published_at,
+                    "channelTitle": f"Fake channel {index}",
+                    "title": f"Fake video {video_index}",
+                    "resourceId": {"kind": "youtube#video", "videoId": self.video_id(index, video_index)},
+                },
+                "contentDetails": {"videoPublishedAt": published_at},
+            })
+
+        response = {"kind": "youtube#playlistItemListResponse", "items": items,
+                    "pageInfo": {"totalResults": self.uploads, "resultsPerPage": max_results}}
+        if end < self.uploads:
+            response["nextPageToken"] = str(end)
+        response["etag"] = hashlib.md5(json.dumps(response, sort_keys=True).encode()).hexdigest()
+        return response
+
+    def videos_list(self, ids: list[str]) -> dict:
+        items = []
+        for video_id in ids:
+            channel_index = self.parse_index(video_id[:7], 1)
+            video_index = self.parse_index(video_id, 8)
+            if not self.is_channel(channel_index) or video_index is None or not 0 <= video_index < self.uploads:
+                continue
+
+            items.append({
+                "kind": "youtube#video",
+                "id": video_id,
+                "snippet": {
+                    "publishedAt": self.published_at(video_index),
+                    "channelId": self.channel_id(channel_index),
+                    "title": f"Fake video {video_index}",
+                    "liveBroadcastContent": "none",
+                },
+                "contentDetails": {"duration": f"PT{3 + video_index % 20}M{video_index % 60}S"},
+            })
+        return {"kind": "youtube#videoListResponse", "items": items}
+
+    def feed(self, channel_id: str, entries: int = 15) -> bytes | None:
+        index = self.parse_index(channel_id, 6)
+        if not self.is_channel(index):
+            return None
+
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+                 '<feed xmlns="http://www.w3.org/2005/Atom">',
+                 f'<title>Fake channel {index}</title>',
+                 f'<published>{self.published_at(self.uploads)}</published>']
+        for video_index in range(min(entries, self.uploads)):
+            lines.append(f'<entry><id>yt:video:{self.video_id(index, video_index)}</id>'
+                         f'<published>{self.published_at(video_index)}</published></entry>')
+        lines.append('</feed>')
+        return "\n".join(lines).encode()
+
+
+class FakeYoutubeServer:
+    """
+    Local stand-in of the YouTube Data API (channels.list, playlistItems.list, videos.list, batch)
+    and of the channel Atom feed. Point YoutubeWorker to it with api_root=server.url
+    """
+
+    def __init__(self, data: FakeYoutubeData, host: str = "127.0.0.1", port: int = 0):
+        self.data = data
+        self.server = ThreadingHTTPServer((host, port), self.build_handler())
+        self.thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    @property
+    def feed_url(self) -> str:
+        return self.url[:-1] + FEED_PATH
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def route(self, method: str, path: str, headers) -> tuple[int, str, bytes]:
+        """
+        :return: status, content type, body
+        """
+        url = urllib.parse.urlparse(path)
+        query = {k: v[0] for k, v in urllib.parse.parse_qs(url.query).items()}
+
+        if url.path == FEED_PATH:
+            body = self.data.feed(query.get("channel_id", ""))
+            return (404, "text/plain", b"") if body is None else (200, "application/atom+xml", body)
+
+        if not url.path.startswith(SERVICE_PATH) or method != "GET":
+            return 404, "text/plain", b""
+
+        endpoint = url.path[len(SERVICE_PATH):]
+        ids = [i for i in query.get("id", "").split(",") if i]
+        if endpoint == "channels":
+            response = self.data.channels_list(ids)
+        elif endpoint == "videos":
+            response = self.data.videos_list(ids)
+        elif endpoint == "playlistItems":
+            max_results = int(query.get("maxResults", DEFAULT_MAX_RESULTS))
+            response = self.data.playlist_items_list(query.get("playlistId", ""), query.get("pageToken", ""),
+                                                     max_results)
+            if response is None:
+                return 404, "application/json", json.dumps({"error": {"code": 404}}).encode()
+            if headers.get("If-None-Match") == response["etag"]:
+                return 304, "application/json", b""
+        else:
+            return 404, "text/plain", b""
+
+        return 200, "application/json", json.dumps(response).encode()
+
+    def route_batch(self, content_type: str, body: bytes) -> bytes:
+        """
+        Each part of the multipart request is a serialized GET request, answered with a serialized response
+        """
+        message = BytesParser().parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+        parts = []
+        for part in message.get_payload():
+            request_lines = part.get_payload().split("\n")
+            method, path, _ = request_lines[0].split(" ", 2)
+            headers = {}
+            for line in request_lines[1:]:
+                line = line.strip()
+                if not line:
+                    break
+                key, value = line.split(":", 1)
+                headers[key.strip()] = value.strip()
+
+            status, part_type, part_body = self.route(method, path, headers)
+            content_id = part["Content-ID"].replace("<", "<response-", 1)
+            parts.append(f"--{BOUNDARY}\r\nContent-Type: application/http\r\nContent-ID: {content_id}\r\n\r\n"
+                         f"HTTP/1.1 {status} Fake\r\nContent-Type: {part_type}\r\n\r\n{part_body.decode()}\r\n")
+        parts.append(f"--{BOUNDARY}--\r\n")
+        return "".join(parts).encode()
+
+    def build_handler(self):
+        fake_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def reply(self, status: int, content_type: str, body: bytes):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self.reply(*fake_server.route("GET", self.path, self.headers))
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if urllib.parse.urlparse(self.path).path != BATCH_PATH:
+                    self.reply(404, "text/plain", b"")
+                    return
+                self.reply(200, f"multipart/mixed; boundary={BOUNDARY}",
+                           fake_server.route_batch(self.headers["Content-Type"], body))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
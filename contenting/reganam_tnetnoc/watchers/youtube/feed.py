@@ -0,0 +1,75 @@
+import urllib.parse
+import urllib.request
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime
+
+from dateutil import parser
+
+FEED_URL = "https://www.youtube.com/feeds/videos.xml"
+FEED_TIMEOUT = 15  # seconds
+
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+ENTRY_TAG = ATOM_NS + "entry"
+PUBLISHED_TAG = ATOM_NS + "published"
+
+
+class YoutubeFeed:
+    """
+    Public Atom feed of a YouTube channel. Contains only the latest uploads, but costs no API quota,
+    so it is used as a cheap check before requesting the API.
+    """
+
+    def __init__(self, base_url: str = FEED_URL, timeout: int = FEED_TIMEOUT):
+        """
+        :param base_url: feed endpoint. Can be pointed to a local server for testing
+        :param timeout: request timeout in seconds
+        """
+        self.base_url = base_url
+        self.timeout = timeout
+
+    def get_url(self, channel_id: str) -> str:
+        return f"{self.base_url}?{urllib.parse.urlencode({'channel_id': channel_id})}"
+
+    def get_latest_publish_date(self, channel_id: str) -> datetime | None:
+        """
+        Feed is parsed while being received, only the "published" dates of the entries are kept.
+        :param channel_id:
+        :return: latest publish date of the channel feed entries. None if feed has no entries
+        """
+        latest: datetime | None = None
+        with urllib.request.urlopen(self.get_url(channel_id), timeout=self.timeout) as response:
+            published: datetime | None = None
+            for event, element in ElementTree.iterparse(response, events=("start", "end")):
+                if event == "start":
+                    if element.tag == ENTRY_TAG:
+                        # Feed itself has a "published" date as well, ignore it
+                        published = None
+                elif element.tag == PUBLISHED_TAG:
+                    published = parser.parse(element.text)
+                elif element.tag == ENTRY_TAG:
+                    if published is None:
+                        raise ValueError(f"Feed entry without publish date. Channel: {channel_id}")
+                    if latest is None or published > latest:
+                        latest = published
+                    published = None
+                    element.clear()
+
+        return latest
+
+    def has_new_uploads(self, channel_id: str, check_date: datetime) -> bool:
+        """
+        On any failure or unexpected feed content returns True, so the caller falls back to the API.
+        :param channel_id:
+        :param check_date: timezone aware datetime of the last check
+        :return: False only if feed confirms that there are no uploads after check_date
+        """
+        try:
+            latest = self.get_latest_publish_date(channel_id)
+        except Exception as e:
+            print(f"Feed check failed for {channel_id}: {repr(e)}")
+            return True
+
+        if latest is None:
+            return True
+
+        return latest > check_date
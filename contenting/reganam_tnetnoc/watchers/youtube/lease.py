@@ -0,0 +1,141 @@
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import pytz
+from django.db import transaction, connection
+from django.db.models import Q
+
+from constants.enums import ContentWatcherStatus
+from contenting.models import ContentWatcher
+
+LEASE_DURATION = timedelta(minutes=10)
+# Fields changed by a check of the watcher (saving it moves modified_at)
+SNAPSHOT_FIELDS = ("check_date", "next_check_date", "modified_at")
+
+
+class WatcherLease:
+    """
+    Exclusive claim of watchers by this process, so multiple processes (or machines sharing the DB) can run
+    watchers from the same pool. A lease expires if not extended by the heartbeat, so a crashed process never
+    keeps a watcher forever.
+    """
+
+    def __init__(self, duration: timedelta = LEASE_DURATION, owner: str = None):
+        """
+        :param duration: lease is extended by the heartbeat each third of it
+        :param owner: unique name of this process. Default - host:pid:random
+        """
+        self.duration = duration
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Watcher pk -> instance, held by this process
+        self.held: dict[int, ContentWatcher] = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.heartbeat_thread: threading.Thread | None = None
+
+    @staticmethod
+    def now() -> datetime:
+        return datetime.now(pytz.UTC)
+
+    def claim(self, watcher: ContentWatcher, unchanged: bool = False, due_before: datetime = None) -> bool:
+        """
+        Row is locked with skip_locked, so concurrent claims never wait and only one of them succeeds.
+        On success, watcher is reloaded from DB (another process may have updated it meanwhile).
+        :param watcher:
+        :param unchanged: claim only if the watcher is unchanged since the instance was loaded (check_date,
+            next_check_date, modified_at). A watcher just checked and released by another process is skipped,
+            instead of being checked again.
+        :param due_before: claim only if the watcher is still due at this time (next_check_date)
+        :return: False if watcher is held by another owner, or doesn't match unchanged / due_before
+        """
+        now = self.now()
+        expires_at = now + self.duration
+        with transaction.atomic():
+            free = (ContentWatcher.objects.select_for_update(skip_locked=True)
+                    .filter(pk=watcher.pk)
+                    .filter(Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lt=now) | Q(lease_owner=self.owner)))
+            if unchanged:
+                free = free.filter(self.get_snapshot_filter(watcher))
+            if due_before:
+                free = free.filter(next_check_date__lte=due_before)
+            if not list(free.values_list("pk", flat=True)):
+                return False
+
+            ContentWatcher.objects.filter(pk=watcher.pk).update(lease_owner=self.owner, lease_expires_at=expires_at)
+
+        watcher.refresh_from_db()
+        with self.lock:
+            self.held[watcher.pk] = watcher
+        return True
+
+    @staticmethod
+    def get_snapshot_filter(watcher: ContentWatcher) -> Q:
+        """
+        :return: filter matching the watcher row only if it still has the values of the instance
+        """
+        snapshot = Q()
+        for field in SNAPSHOT_FIELDS:
+            value = getattr(watcher, field)
+            snapshot &= Q(**{f"{field}__isnull": True}) if value is None else Q(**{field: value})
+        return snapshot
+
+    def release(self, watcher: ContentWatcher) -> None:
+        with self.lock:
+            self.held.pop(watcher.pk, None)
+
+        ContentWatcher.objects.filter(pk=watcher.pk, lease_owner=self.owner).update(lease_owner="",
+                                                                                    lease_expires_at=None)
+        watcher.lease_owner = ""
+        watcher.lease_expires_at = None
+
+    def extend(self) -> None:
+        """
+        Extend the leases of all held watchers. In-memory instances are updated as well, so their next save()
+        doesn't set back an older expiry.
+        """
+        with self.lock:
+            held = list(self.held.values())
+        if not held:
+            return
+
+        expires_at = self.now() + self.duration
+        ContentWatcher.objects.filter(pk__in=[watcher.pk for watcher in held],
+                                      lease_owner=self.owner).update(lease_expires_at=expires_at)
+        for watcher in held:
+            watcher.lease_expires_at = expires_at
+
+    def heartbeat(self) -> None:
+        try:
+            while not self.stop_event.wait(self.duration.total_seconds() / 3):
+                try:
+                    self.extend()
+                except Exception as e:
+                    print(f"Lease heartbeat failed: {repr(e)}")
+        finally:
+            connection.close()
+
+    def start_heartbeat(self) -> None:
+        self.stop_event.clear()
+        self.heartbeat_thread = threading.Thread(target=self.heartbeat, name="lease_heartbeat", daemon=True)
+        self.heartbeat_thread.start()
+
+    def stop_heartbeat(self) -> None:
+        self.stop_event.set()
+        if self.heartbeat_thread:
+            self.heartbeat_thread.join()
+            self.heartbeat_thread = None
+
+    def reclaim_stale(self) -> int:
+        """
+        Watchers left RUNNING by a crashed process are set to ERROR, so they are checked again.
+        Stale - lease expired, or no lease and not modified for a lease duration.
+        :return: number of reclaimed watchers
+        """
+        now = self.now()
+        return (ContentWatcher.objects.filter(status=ContentWatcherStatus.RUNNING.value)
+                .filter(Q(lease_expires_at__lt=now) |
+                        Q(lease_expires_at__isnull=True, modified_at__lt=now - self.duration))
+                .update(status=ContentWatcherStatus.ERROR.value, lease_owner="", lease_expires_at=None))
@@ -17,6 +17,7 @@ from contenting.reganam_tnetnoc.watchers.youtube.watcher import YoutubeWatcher
 from utils import file
 from utils.datetime_utils import compare_yt_dates, utcnow, default_utc
 from utils.ffmpeg import Ffmpeg
+from utils.log_sink import get_sink
 
 
 class YoutubeWatchersManager:
@@ -34,11 +35,16 @@ class YoutubeWatchersManager:
         self.downloader = YoutubeDownloader(env.FFMPEG)
 
     # Add message to the log file
-    def log(self, message, console_print: bool = False) -> None:
+    def log(self, message, console_print: bool = False, **fields) -> None:
+        """
+        :param message:
+        :param console_print: message is printed as well. Only for lines worth watching live.
+        :param fields: extra JSON fields of the log record
+        """
         if self.log_file is None:
             print(message)
         else:
-            file.append(self.log_file, message)
+            get_sink(self.log_file).write(message, **fields)
             if console_print:
                 print(message)
 
@@ -90,29 +96,38 @@ class YoutubeWatchersManager:
         for watcher in self.watchers:
             self.log(f'Checking: {watcher.channel_id} - {watcher.name}', True)
             watcher.new_check_date = utcnow()
+            self.api.set_context(watcher.channel_id)
             api_videos = self.api.get_uploads(watcher.channel_id, watcher.check_date)
+            self.log_date_conflicts(watcher.channel_id)
 
             self.log(f"{watcher.name.ljust(30)} || New uploads - {len(api_videos)}", True)
             for api_video in api_videos:
-                self.log("\t" + repr(api_video))
-                print(f"{api_video.get_publish_date()} | {api_video.get_id()} | {api_video.get_title()}")
+                self.log("New upload", watcher=watcher.name, **api_video.to_log())
                 watcher.video_count += 1
                 video = watcher.init_video(api_video)
                 if video.status == YoutubeVideo.STATUS_SKIP:
-                    self.log(f"Video skipped: {api_video.get_id()}", True)
-                    print(f"Video data: {video}")
-                    print(f"Api data: {api_video}")
+                    self.log(f"Video skipped: {api_video.get_id()}", True, watcher=watcher.name,
+                             **api_video.to_log())
                 watcher.append_video(video)
 
     def extract_all_api_videos(self):
         for watcher in self.watchers:
             watcher.new_check_date = watcher.check_date
+            self.api.set_context(watcher.channel_id)
             api_videos = self.api.get_uploads(watcher.channel_id, default_utc(),
                                               watcher.check_date)
+            self.log_date_conflicts(watcher.channel_id)
             watcher.api_videos = api_videos
             watcher.extract_missing()
             watcher.extract_changed()
 
+    def log_date_conflicts(self, channel_id: str) -> None:
+        """
+        No DB here, deferred publish date conflicts are kept only in the log file for review
+        """
+        for conflict in self.api.pop_date_conflicts(channel_id):
+            self.log(f"Deferred publish date {repr(conflict)}", True)
+
     def generate_queue(self) -> None:
         self.log("Generating download queue")
 
@@ -0,0 +1,263 @@
+import queue
+import threading
+import time
+from typing import Callable
+
+from django.db import connection
+
+from contenting.models import ContentItem, ContentMusicItem
+from contenting.reganam_tnetnoc.watchers.youtube.django_manager import YoutubeWatcherDjangoManager
+from contenting.reganam_tnetnoc.watchers.youtube.lease import WatcherLease
+
+DEFAULT_QUEUE_SIZE = 10
+PROGRESS_INTERVAL = 30  # seconds
+
+# Put in a stage queue once per worker, when nothing else will come
+_STOP = object()
+
+
+class PipelineTask:
+    def __init__(self, manager: YoutubeWatcherDjangoManager):
+        self.manager = manager
+        self.items: list[ContentItem | ContentMusicItem] = []
+        self.claimed = False
+
+
+class PipelineStage:
+    """
+    Pool of workers, which take tasks from in_queue and put processed tasks in out_queue
+    """
+
+    def __init__(self, name: str, func: Callable[[PipelineTask], bool], workers: int, in_queue: queue.Queue,
+                 out_queue: queue.Queue | None, on_done: Callable[[PipelineTask], None]):
+        """
+        :param name:
+        :param func: processes the task. Returns False if the task has to stop at this stage
+        :param workers: number of threads
+        :param in_queue:
+        :param out_queue: None for the last stage
+        :param on_done: called when the task leaves the pipeline at this stage
+        """
+        self.name = name
+        self.func = func
+        self.on_done = on_done
+        self.workers = workers
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.next_stage: PipelineStage | None = None
+        self.threads: list[threading.Thread] = []
+        self.lock = threading.Lock()
+        self.running_workers = 0
+
+        self.processed = 0
+        self.failed = 0
+        self.busy_time = 0.0
+
+    def start(self) -> None:
+        self.running_workers = self.workers
+        for i in range(self.workers):
+            thread = threading.Thread(target=self.work, name=f"{self.name}_{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def work(self) -> None:
+        try:
+            while (task := self.in_queue.get()) is not _STOP:
+                start = time.perf_counter()
+                try:
+                    passed = self.func(task)
+                except Exception as e:
+                    passed = False
+                    self.add_result(False, time.perf_counter() - start)
+                    print(f"Pipeline stage {self.name} failed for <{task.manager.watcher.name}>: {repr(e)}")
+                else:
+                    self.add_result(True, time.perf_counter() - start)
+
+                if passed and self.out_queue is not None:
+                    self.out_queue.put(task)
+                else:
+                    self.on_done(task)
+        finally:
+            # Each thread has its own DB connection
+            connection.close()
+            self.worker_stopped()
+
+    def add_result(self, success: bool, busy_time: float) -> None:
+        with self.lock:
+            self.busy_time += busy_time
+            if success:
+                self.processed += 1
+            else:
+                self.failed += 1
+
+    def worker_stopped(self) -> None:
+        with self.lock:
+            self.running_workers -= 1
+            last = self.running_workers == 0
+
+        # Next stage is stopped only when all its input is produced
+        if last and self.next_stage:
+            for _ in range(self.next_stage.workers):
+                self.out_queue.put(_STOP)
+
+    def join(self) -> None:
+        for thread in self.threads:
+            thread.join()
+
+    def get_metrics(self, elapsed: float) -> dict:
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "queue": self.in_queue.qsize(),
+            "processed": self.processed,
+            "failed": self.failed,
+            "busy_time": self.busy_time,
+            "throughput": self.processed / elapsed if elapsed else 0.0,
+        }
+
+
+class WatcherPipeline:
+    """
+    Watcher updates split in stages: check (API) -> download -> tag -> commit (DB).
+    Each stage has its own workers and a bounded input queue, so downloads of one watcher overlap with the API check
+    of another one and tagging of a third one. Total time is set by the slowest stage.
+    """
+
+    def __init__(self, check_workers: int = 1, download_workers: int = 1, tag_workers: int = 1,
+                 queue_size: int = DEFAULT_QUEUE_SIZE,
+                 on_commit: Callable[[YoutubeWatcherDjangoManager], None] = None,
+                 on_done: Callable[[YoutubeWatcherDjangoManager], None] = None, lease: WatcherLease = None,
+                 scheduled: bool = False):
+        """
+        :param check_workers:
+        :param download_workers:
+        :param tag_workers:
+        :param queue_size: max tasks waiting for a stage. When full, previous stage waits.
+        :param on_commit: called in commit stage after the watcher update is saved
+        :param on_done: called for each watcher when it leaves the pipeline, at any stage (ex: nothing new in check).
+            Not called for watchers skipped because another process holds them.
+        :param lease: when set, each watcher is claimed before check and released when it leaves the pipeline.
+            Watchers claimed by other processes, or changed since they were selected, are skipped.
+        :param scheduled: watchers are claimed only if still due when their check starts
+        """
+        self.on_commit = on_commit
+        self.on_done = on_done
+        self.lease = lease
+        self.scheduled = scheduled
+        queues = [queue.Queue(maxsize=queue_size) for _ in range(4)]
+        # DB writes are done by a single worker
+        self.stages = [
+            PipelineStage("check", self.check, check_workers, queues[0], queues[1], self.done),
+            PipelineStage("download", self.download, download_workers, queues[1], queues[2], self.done),
+            PipelineStage("tag", self.tag, tag_workers, queues[2], queues[3], self.done),
+            PipelineStage("commit", self.commit, 1, queues[3], None, self.done),
+        ]
+        for stage, next_stage in zip(self.stages, self.stages[1:]):
+            stage.next_stage = next_stage
+        self.started_at: float | None = None
+
+    def check(self, task: PipelineTask) -> bool:
+        if self.lease:
+            due_before = self.lease.now() if self.scheduled else None
+            task.claimed = self.lease.claim(task.manager.watcher, unchanged=True, due_before=due_before)
+            if not task.claimed:
+                print(f"Watcher <{task.manager.watcher.name}> is claimed or already checked by another worker")
+                return False
+
+        items = task.manager.check_updates()
+        if items is None:
+            return False
+
+        task.items = items
+        return True
+
+    @staticmethod
+    def run_stage(task: PipelineTask, func: Callable[[list[ContentItem | ContentMusicItem]], None]) -> bool:
+        try:
+            func(task.items)
+        except Exception as e:
+            task.manager.fail()
+            raise e
+        return True
+
+    def download(self, task: PipelineTask) -> bool:
+        return self.run_stage(task, task.manager.download_updates)
+
+    def tag(self, task: PipelineTask) -> bool:
+        return self.run_stage(task, task.manager.tag_updates)
+
+    def commit(self, task: PipelineTask) -> bool:
+        self.run_stage(task, task.manager.commit_updates)
+        if self.on_commit:
+            self.on_commit(task.manager)
+        return True
+
+    def done(self, task: PipelineTask) -> None:
+        if self.lease and not task.claimed:
+            return
+
+        if self.on_done:
+            try:
+                self.on_done(task.manager)
+            except Exception as e:
+                print(f"Pipeline on_done failed for <{task.manager.watcher.name}>: {repr(e)}")
+
+        if not task.claimed:
+            return
+
+        try:
+            self.lease.release(task.manager.watcher)
+        except Exception as e:
+            # Lease expires by itself
+            print(f"Lease release failed for <{task.manager.watcher.name}>: {repr(e)}")
+
+    def get_elapsed(self) -> float:
+        return time.perf_counter() - self.started_at if self.started_at else 0.0
+
+    def get_metrics(self) -> list[dict]:
+        """
+        :return: per stage - workers, queue length, processed and failed tasks, busy time and throughput (tasks/sec)
+        """
+        elapsed = self.get_elapsed()
+        return [stage.get_metrics(elapsed) for stage in self.stages]
+
+    def summary(self) -> list[str]:
+        lines = [f"Pipeline elapsed: {self.get_elapsed():.1f}s"]
+        for m in self.get_metrics():
+            lines.append(f"\t{m['stage'].ljust(10)} workers: {m['workers']} | queue: {m['queue']} | "
+                         f"processed: {m['processed']} | failed: {m['failed']} | busy: {m['busy_time']:.1f}s | "
+                         f"throughput: {m['throughput']:.2f}/s")
+        return lines
+
+    def run(self, managers: list[YoutubeWatcherDjangoManager], progress_interval: float = PROGRESS_INTERVAL) -> None:
+        """
+        Blocks until all managers are through all stages. Progress is printed every progress_interval seconds.
+        """
+        self.started_at = time.perf_counter()
+        for stage in self.stages:
+            stage.start()
+
+        feeder = threading.Thread(target=self.feed, args=(managers,), name="pipeline_feed", daemon=True)
+        feeder.start()
+
+        for thread in self.stages[-1].threads:
+            thread.join(timeout=progress_interval)
+            while thread.is_alive():
+                for line in self.summary():
+                    print(line)
+                thread.join(timeout=progress_interval)
+
+        feeder.join()
+        for stage in self.stages:
+            stage.join()
+
+        failed = sum(stage.failed for stage in self.stages)
+        if failed:
+            print(f"Pipeline finished with failures: {failed}")
+
+    def feed(self, managers: list[YoutubeWatcherDjangoManager]) -> None:
+        first_stage = self.stages[0]
+        for manager in managers:
+            first_stage.in_queue.put(PipelineTask(manager))
+        for _ in range(first_stage.workers):
+            first_stage.in_queue.put(_STOP)
@@ -28,12 +28,15 @@ class YoutubeQueue:
     def get_file_abs_path(self):
         return f"{self.save_location}\\{self.file_name}.{self.file_extension.value}"
 
-    def replace_file_name_tags(self):
+    def replace_file_name_tags(self, info_dict: dict = None):
+        """
+        :param info_dict: extracted info of the video. Default - info of the finished video download
+        """
         file_name = self.file_name
-        for key, value in self.video_dl_stats.get(INFO_DICT).items():
+        for key, value in (info_dict or self.video_dl_stats.get(INFO_DICT)).items():
             tag = f"%({key})s"
             if tag in file_name:
-                file_name = file_name.replace(tag, value)
+                file_name = file_name.replace(tag, str(value))
         if file_name != self.file_name:
             self.file_name = normalize_file_name(file_name)
 
@@ -0,0 +1,106 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytz
+from django.db import connection
+
+from constants import paths
+from constants.enums import ContentWatcherStatus, DownloadStatus
+from contenting.models import ContentItem, ContentMusicItem, ContentWatcher
+from contenting.queryset import ContentItemAbstractQuerySet
+from contenting.reganam_tnetnoc.utils.download_pool import DownloadPool
+from contenting.reganam_tnetnoc.watchers.youtube.api import YoutubeWorker
+from contenting.reganam_tnetnoc.watchers.youtube.django_manager import YoutubeWatcherDjangoManager, group_by_watcher
+from contenting.reganam_tnetnoc.watchers.youtube.lease import WatcherLease
+
+DEFAULT_CONCURRENCY = 2
+# Watchers whose items are never retried
+UNAVAILABLE_STATUSES = (ContentWatcherStatus.DEAD.value, ContentWatcherStatus.NONE.value,
+                        ContentWatcherStatus.IGNORE.value)
+
+
+class RetryEngine:
+    """
+    Retries failed downloads (UNABLE / MISSING) of all download watchers at once. Items are selected set-wise,
+    grouped by watcher, and the watchers are retried in parallel on a shared DownloadPool. Each failure delays the
+    next retry of the item exponentially (see ContentItemAbstract.download_failed), until max_attempts.
+    """
+
+    def __init__(self, worker: YoutubeWorker, download_pool: DownloadPool, lease: WatcherLease = None,
+                 concurrency: int = DEFAULT_CONCURRENCY, max_attempts: int = ContentItem.RETRY_MAX_ATTEMPTS,
+                 log_file: str = paths.YOUTUBE_API_LOG):
+        """
+        :param worker:
+        :param download_pool: limits of the parallel downloads, shared by all watchers
+        :param lease: when set, each watcher is claimed before retry. Watchers claimed by other processes are skipped.
+        :param concurrency: number of watchers retried at the same time
+        :param max_attempts: items which failed this many times are not retried
+        :param log_file:
+        """
+        self.worker = worker
+        self.download_pool = download_pool
+        self.lease = lease
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.log_file = log_file
+
+    def get_items(self, force: bool = False, watcher_ids: list[str] = None) -> list[ContentItem | ContentMusicItem]:
+        """
+        One query per item model, for any number of watchers. Items come with their content_list and content_watcher.
+        :param force: ignore the backoff, retry all items below max_attempts
+        :param watcher_ids: only items of these watchers (watcher_id). Default - all download watchers
+        """
+        now = None if force else datetime.now(pytz.UTC)
+        result: list[ContentItem | ContentMusicItem] = []
+        for model in (ContentItem, ContentMusicItem):
+            items = (model.objects.filter_retryable(self.max_attempts, now)
+                     .filter(content_list__content_watcher__download=True)
+                     .exclude(content_list__content_watcher__status__in=UNAVAILABLE_STATUSES))
+            if watcher_ids:
+                items = items.filter(content_list__content_watcher__watcher_id__in=watcher_ids)
+            result.extend(items.select_related("content_list__content_watcher").order_by("content_list", "position"))
+        return result
+
+    def retry_watcher(self, watcher: ContentWatcher, items: list[ContentItem | ContentMusicItem]) -> bool:
+        """
+        Executed inside a retry thread, which has its own DB connection
+        :return: False if the watcher is claimed by another worker and its items were not retried
+        """
+        try:
+            if self.lease and not self.lease.claim(watcher):
+                print(f"Watcher <{watcher.name}> is claimed by another worker")
+                return False
+
+            try:
+                manager = YoutubeWatcherDjangoManager(self.worker, watcher, log_file=self.log_file,
+                                                      download_pool=self.download_pool)
+                manager.retry_items(items)
+            finally:
+                if self.lease:
+                    self.lease.release(watcher)
+            return True
+        finally:
+            connection.close()
+
+    def run(self, items: list[ContentItem | ContentMusicItem]) -> tuple[int, int, int]:
+        """
+        :return: number of downloaded items, number of items which failed again, number of items skipped because
+        their watcher is claimed by another worker
+        """
+        groups = group_by_watcher(items)
+        skipped_items: list[ContentItem | ContentMusicItem] = []
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="retry") as executor:
+            futures = {executor.submit(self.retry_watcher, watcher, watcher_items): (watcher, watcher_items)
+                       for watcher, watcher_items in groups}
+            for future, (watcher, watcher_items) in futures.items():
+                try:
+                    if not future.result():
+                        skipped_items.extend(watcher_items)
+                except Exception as e:
+                    print(f"Retry failed for <{watcher.name}>: {repr(e)}")
+
+        skipped_ids = {id(item) for item in skipped_items}
+        retried = [item for item in items if id(item) not in skipped_ids]
+        downloaded = sum(1 for item in retried if item.download_status == DownloadStatus.DOWNLOADED.value)
+        failed = sum(1 for item in retried if item.download_status in ContentItemAbstractQuerySet.RETRY_STATUSES)
+        return downloaded, failed, len(skipped_items)
@@ -0,0 +1,138 @@
+import statistics
+from datetime import datetime, timedelta
+
+import pytz
+from django.db.models import Max
+
+from constants.enums import ContentWatcherStatus
+from contenting.models import ContentWatcher, ContentItem, ContentMusicItem
+
+MIN_INTERVAL = timedelta(hours=1)
+MAX_STALENESS = timedelta(days=7)
+# Part of the usual gap between uploads after which a channel is checked again
+CHECK_FACTOR = 0.5
+# Cadence is learned only from the latest uploads
+HISTORY_SIZE = 20
+HISTORY_WINDOW = timedelta(days=365)
+# Watchers which are never checked, so never due
+UNSCHEDULED_STATUSES = (ContentWatcherStatus.DEAD.value, ContentWatcherStatus.IGNORE.value,
+                        ContentWatcherStatus.NONE.value)
+
+
+class WatcherScheduler:
+    """
+    Decides when each watcher is checked, by the upload cadence learned from its ContentList published_at history.
+    Active channels are checked often, inactive ones rarely, but never less than once per max_staleness.
+    """
+
+    def __init__(self, min_interval: timedelta = MIN_INTERVAL, max_staleness: timedelta = MAX_STALENESS,
+                 check_factor: float = CHECK_FACTOR):
+        self.min_interval = min_interval
+        self.max_staleness = max_staleness
+        self.check_factor = check_factor
+
+    @staticmethod
+    def now() -> datetime:
+        return datetime.now(pytz.UTC)
+
+    def estimate_interval(self, publish_dates: list[datetime], last_publish_date: datetime | None,
+                          now: datetime) -> timedelta:
+        """
+        :param publish_dates: latest publish dates of the channel, descending
+        :param last_publish_date: latest publish date of the channel. None if channel has no uploads
+        :param now:
+        :return: time between two checks of the channel
+        """
+        if last_publish_date is None:
+            return self.max_staleness
+
+        if len(publish_dates) >= 2:
+            gaps = [(d1 - d2).total_seconds() for d1, d2 in zip(publish_dates, publish_dates[1:])]
+            expected_gap = statistics.median(gaps)
+        else:
+            # Not enough recent uploads, the longer the channel is silent the less often it is checked
+            expected_gap = (now - last_publish_date).total_seconds()
+
+        # Channel is silent much longer than usual, slow down
+        expected_gap = max(expected_gap, (now - last_publish_date).total_seconds() / 4)
+
+        interval = timedelta(seconds=expected_gap * self.check_factor)
+        return min(max(interval, self.min_interval), self.max_staleness)
+
+    @staticmethod
+    def get_publish_history(watchers: list[ContentWatcher], now: datetime) \
+            -> tuple[dict[int, list[datetime]], dict[int, datetime]]:
+        """
+        Same number of queries for any number of watchers.
+        :return: content list ID -> latest publish dates (descending, up to HISTORY_SIZE),
+            content list ID -> last publish date
+        """
+        content_list_ids = [watcher.content_list_id for watcher in watchers]
+        history: dict[int, list[datetime]] = {}
+        last_dates: dict[int, datetime] = {}
+        for model in (ContentItem, ContentMusicItem):
+            recent = (model.objects.filter(content_list_id__in=content_list_ids,
+                                           published_at__gte=now - HISTORY_WINDOW)
+                      .values_list("content_list_id", "published_at"))
+            for content_list_id, published_at in recent:
+                history.setdefault(content_list_id, []).append(published_at)
+
+            latest = (model.objects.filter(content_list_id__in=content_list_ids)
+                      .values("content_list_id").annotate(last=Max("published_at")))
+            for row in latest:
+                last = last_dates.get(row["content_list_id"])
+                if last is None or row["last"] > last:
+                    last_dates[row["content_list_id"]] = row["last"]
+
+        for content_list_id, dates in history.items():
+            history[content_list_id] = sorted(dates, reverse=True)[:HISTORY_SIZE]
+
+        return history, last_dates
+
+    def schedule(self, watchers: list[ContentWatcher]) -> None:
+        """
+        Update check_interval and next_check_date of the watchers from their current history.
+        """
+        now = self.now()
+        history, last_dates = self.get_publish_history(watchers, now)
+        for watcher in watchers:
+            if watcher.next_check_date is None:
+                last_checked = watcher.check_date
+            else:
+                # check_date is not moved when feed has nothing new, so last check is derived from the schedule
+                last_checked = watcher.next_check_date - timedelta(seconds=watcher.check_interval)
+
+            interval = self.estimate_interval(history.get(watcher.content_list_id, []),
+                                              last_dates.get(watcher.content_list_id), now)
+            watcher.check_interval = int(interval.total_seconds())
+            watcher.next_check_date = last_checked + interval
+
+        ContentWatcher.objects.bulk_update(watchers, ["check_interval", "next_check_date"])
+
+    def get_due(self, watchers: list[ContentWatcher]) -> list[ContentWatcher]:
+        """
+        :return: watchers which have to be checked now, most overdue (relative to their interval) first
+        """
+        self.schedule(watchers)
+        now = self.now()
+        due = [watcher for watcher in watchers
+               if watcher.next_check_date <= now and watcher.status not in UNSCHEDULED_STATUSES]
+        return sorted(due, key=lambda w: (now - w.next_check_date) / max(timedelta(seconds=w.check_interval),
+                                                                         self.min_interval), reverse=True)
+
+    def reschedule(self, watcher: ContentWatcher) -> None:
+        """
+        Called after a check of the watcher, with its updated history
+        """
+        now = self.now()
+        history, last_dates = self.get_publish_history([watcher], now)
+        interval = self.estimate_interval(history.get(watcher.content_list_id, []),
+                                          last_dates.get(watcher.content_list_id), now)
+        watcher.check_interval = int(interval.total_seconds())
+        watcher.next_check_date = now + interval
+        watcher.save(update_fields=["check_interval", "next_check_date"])
+
+    def get_next_due_date(self, watchers: list[ContentWatcher]) -> datetime | None:
+        dates = [watcher.next_check_date for watcher in watchers
+                 if watcher.next_check_date and watcher.status not in UNSCHEDULED_STATUSES]
+        return min(dates) if dates else None
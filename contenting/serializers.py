@@ -12,6 +12,7 @@ class ContentListSerializer(serializers.ModelSerializer):
     class Meta:
         model = ContentList
         fields = '__all__'
+        read_only_fields = ContentList.COUNTER_FIELDS
 
 
 class ContentItemSerializer(serializers.ModelSerializer):
@@ -121,7 +122,7 @@ class ContentWatcherSerializer(serializers.ModelSerializer):
             content_list_instance: ContentList = instance.content_list
             content_list_instance.name = validated_data['name']
             content_list_instance.category = validated_data['category']
-            content_list_instance.save()
+            content_list_instance.save(update_fields=["name", "category"])
 
         res = super().update(instance, validated_data)
         return res
@@ -1,11 +1,13 @@
 from time import sleep
 
-from django.db.models.signals import pre_save, pre_delete, post_delete
+from django.db.models import QuerySet
+from django.db.models.signals import pre_save, pre_delete, post_delete, post_save
 from django.dispatch import receiver
 
 from constants.enums import ContentCategory
 from listening.models import Track
-from .models import ContentTrack, ContentList
+from .models import ContentTrack, ContentList, ContentItem, ContentMusicItem
+from .queryset import add_counters
 
 
 @receiver(post_delete, sender=ContentList)
@@ -52,3 +54,43 @@ def handle_content_track_update(sender, instance, **kwargs):
     if old_track != new_track:
         if old_track and not old_track.is_clean and old_track.content_tracks.count() == 1:
             old_track.delete()
+
+
+@receiver(post_save, sender=ContentItem)
+@receiver(post_save, sender=ContentMusicItem)
+def handle_content_item_save(sender, instance: ContentItem | ContentMusicItem, created: bool, update_fields,
+                             **kwargs):
+    """
+    Keep ContentList counters in sync with created and updated items. No query if counted fields didn't change.
+    """
+    if update_fields is not None and not set(update_fields) & set(instance.COUNTED_FIELDS):
+        return
+
+    old_state = None if created else instance.get_saved_counted_state()
+    new_state = instance.get_counted_state()
+    if not created and old_state is None:
+        # Item was not loaded with its counted fields, so they are not saved either
+        return
+
+    deltas: dict[int, dict[str, int]] = {}
+    if old_state:
+        add_counters(deltas, *old_state, sign=-1)
+    if new_state:
+        add_counters(deltas, *new_state)
+    ContentList.objects.apply_counters(deltas)
+    instance._counted_state = new_state
+
+
+@receiver(post_delete, sender=ContentItem)
+@receiver(post_delete, sender=ContentMusicItem)
+def handle_content_item_deletion(sender, instance: ContentItem | ContentMusicItem, origin=None, **kwargs):
+    # Items deleted together with their list have no counters left to update
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is ContentList:
+        return
+
+    state = instance.get_saved_counted_state() or instance.get_counted_state()
+    if state:
+        deltas: dict[int, dict[str, int]] = {}
+        add_counters(deltas, *state, sign=-1)
+        ContentList.objects.apply_counters(deltas)
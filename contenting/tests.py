@@ -1,3 +1,107 @@
 from django.test import TestCase
 
-# Create your tests here.
+from constants.enums import ContentCategory, DownloadStatus, ContentWatcherSourceType, FileExtension, VideoQuality, \
+    ContentWatcherStatus
+from contenting.models import ContentList, ContentItem, ContentWatcher
+from contenting.reganam_tnetnoc.watchers.youtube.django_manager import YoutubeWatcherDjangoManager
+from contenting.serializers import ContentWatcherSerializer, ContentListSerializer
+from utils import datetime_utils
+from utils.datetime_utils import default_utc
+
+
+def new_watcher(name: str) -> ContentWatcher:
+    content_list = ContentList.objects.create(name=name, category=ContentCategory.OTHER.value, migration_position=0)
+    return ContentWatcher.objects.create(
+        name=name, category=ContentCategory.OTHER.value, watcher_id=f"UC{name}", content_list=content_list,
+        source_type=ContentWatcherSourceType.YOUTUBE.value, file_extension=FileExtension.MKV.value,
+        video_quality=VideoQuality.DEFAULT.value, status=ContentWatcherStatus.FINISHED.value, download=False)
+
+
+class FakeUpload:
+    """
+    Stands for YoutubeAPIItem, only the getters used by process_new_uploads
+    """
+
+    def __init__(self, video_id: str, title: str):
+        self.video_id = video_id
+        self.title = title
+
+    def get_id(self): return self.video_id
+
+    def get_url(self): return f"https://www.youtube.com/watch?v={self.video_id}"
+
+    def get_title(self): return self.title
+
+    def get_publish_datetime(self): return default_utc()
+
+    def has_valid_duration(self): return True
+
+    def to_log(self): return {"id": self.video_id}
+
+
+def new_content_item(content_list: ContentList, position: int, consumed: bool = False) -> ContentItem:
+    return ContentItem(content_list=content_list, item_id=f"item{position}", title=f"Item {position}",
+                       position=position, consumed=consumed, download_status=DownloadStatus.NONE.value,
+                       published_at=default_utc())
+
+
+class ContentListCountersTest(TestCase):
+    def setUp(self):
+        self.watcher = new_watcher("List")
+        self.content_list = self.watcher.content_list
+        new_content_item(self.content_list, 1, consumed=True).save()
+
+    def assert_counters(self, items_count: int, unconsumed_count: int):
+        self.content_list.refresh_from_db()
+        self.assertEqual(self.content_list.items_count, items_count)
+        self.assertEqual(self.content_list.unconsumed_count, unconsumed_count)
+
+    def test_watcher_rename_with_stale_list(self):
+        watcher = ContentWatcher.objects.select_related("content_list").get(pk=self.watcher.pk)
+        # Added after the watcher and its list are loaded
+        new_content_item(self.content_list, 2).save()
+
+        serializer = ContentWatcherSerializer(watcher, data={"name": "Renamed", "category": watcher.category},
+                                              partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+
+        self.assert_counters(2, 1)
+        self.assertEqual(self.content_list.name, "Renamed")
+
+    def test_list_update_with_stale_list(self):
+        content_list = ContentList.objects.get(pk=self.content_list.pk)
+        new_content_item(self.content_list, 2).save()
+
+        serializer = ContentListSerializer(content_list, data={"name": "Renamed"}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+
+        self.assert_counters(2, 1)
+        self.assertEqual(self.content_list.name, "Renamed")
+
+
+class WatcherCommitTest(TestCase):
+    def setUp(self):
+        self.watcher = new_watcher("Channel")
+
+    def commit(self, uploads: list[FakeUpload]) -> None:
+        watcher = ContentWatcher.objects.select_related("content_list").get(pk=self.watcher.pk)
+        manager = YoutubeWatcherDjangoManager(None, watcher)
+        manager.new_check_date = datetime_utils.utcnow()
+        manager.commit_updates(manager.process_new_uploads(uploads))
+
+    def test_same_upload_committed_twice(self):
+        self.commit([FakeUpload("a", "First")])
+        ContentItem.objects.filter(item_id="a").update(position=5, file_name="Renamed")
+
+        self.commit([FakeUpload("a", "First (edited)"), FakeUpload("b", "Second")])
+
+        items = {item.item_id: item for item in ContentItem.objects.filter(content_list=self.watcher.content_list)}
+        self.assertEqual(len(items), 2)
+        self.assertEqual(items["a"].title, "First (edited)")
+        self.assertEqual(items["a"].position, 5)
+        self.assertEqual(items["a"].file_name, "Renamed")
+        self.assertEqual(items["b"].position, 2)
+        self.watcher.content_list.refresh_from_db()
+        self.assertEqual(self.watcher.content_list.items_count, 2)
@@ -1,6 +1,7 @@
 import math
 import os
 import re
+import subprocess
 from typing import Tuple
 
 # noinspection PyPackageRequirements
@@ -199,14 +200,15 @@ class Ffmpeg:
             target_bitrate = math.floor(original_bitrate * ratio)
 
         file_format = file_abs_path.split(".")[-1]
-        file_path = "\\".join(file_abs_path.split("\\")[:-1])
-        temp_resize_file = file_path + "\\temp_resized." + file_format
+        # Named after the file, so files in the same folder can be resized in parallel
+        temp_resize_file = file_abs_path[:-len(file_format)] + "resized." + file_format
 
-        command = f"ffmpeg -hwaccel cuda -i \"{file_abs_path}\" -vf scale={w}:{h} -c:v h264_nvenc "
+        # Arguments are passed as list, so paths with spaces don't need quoting
+        command = ["ffmpeg", "-hwaccel", "cuda", "-i", file_abs_path, "-vf", f"scale={w}:{h}", "-c:v", "h264_nvenc"]
         if scale_bitrate:
-            command += f"-b:v {target_bitrate} "
-        command += f"{temp_resize_file}"
-        os.system(command)
+            command += ["-b:v", str(target_bitrate)]
+        command.append(temp_resize_file)
+        subprocess.run(command)
 
         # Delete resized file if it is still larger or equal to original file
         original_size = os.path.getsize(file_abs_path)
@@ -248,12 +250,12 @@ class Ffmpeg:
             return
 
         file_format = file_abs_path.split(".")[-1]
-        file_path = "\\".join(file_abs_path.split("\\")[:-1])
-        temp_resize_file = file_path + "\\temp_resized." + file_format
+        # Named after the file, so files in the same folder can be resized in parallel
+        temp_resize_file = file_abs_path[:-len(file_format)] + "resized." + file_format
 
         # -b:v 1M (will try to set bitrate to 1 megabyte)
-        command = f"ffmpeg -hwaccel cuda -i \"{file_abs_path}\" -c:v h264_nvenc -b:v {bitrate} {temp_resize_file}"
-        os.system(command)
+        subprocess.run(["ffmpeg", "-hwaccel", "cuda", "-i", file_abs_path, "-c:v", "h264_nvenc", "-b:v", bitrate,
+                        temp_resize_file])
 
         # Delete resized file if it is still larger or equal to original file
         original_size = os.path.getsize(file_abs_path)
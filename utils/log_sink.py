@@ -0,0 +1,119 @@
+import atexit
+import codecs
+import json
+import os
+import queue
+import threading
+
+from utils import file
+from utils.datetime_utils import utcnow
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUPS = 5
+FLUSH_INTERVAL = 1.0  # seconds
+MAX_BATCH = 1000
+
+# Put in the queue to stop the writer thread
+_STOP = None
+
+_sinks: dict[str, "LogSink"] = {}
+_sinks_lock = threading.Lock()
+
+
+class LogSink:
+    """
+    JSONL log file written by a background thread. Callers only put records in a queue, records are written in
+    batches, with a single file open per batch. File is rotated by size: file -> file.1 -> ... -> file.<backups>.
+    """
+
+    def __init__(self, file_path: str, max_bytes: int = DEFAULT_MAX_BYTES, backups: int = DEFAULT_BACKUPS,
+                 flush_interval: float = FLUSH_INTERVAL):
+        """
+        :param file_path:
+        :param max_bytes: file is rotated when it gets bigger. 0 - never rotate
+        :param backups: number of rotated files kept
+        :param flush_interval: max seconds a record waits in the queue
+        """
+        self.file_path = file_path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.queue: queue.Queue = queue.Queue()
+        self.thread = threading.Thread(target=self.work, name="log_sink", daemon=True)
+        self.thread.start()
+
+    def write(self, message: str, **fields) -> None:
+        """
+        Never blocks
+        :param message:
+        :param fields: extra JSON fields of the record
+        """
+        self.queue.put({"time": utcnow(), "message": message, **fields})
+
+    def work(self) -> None:
+        stopped = False
+        while not stopped:
+            batch = []
+            try:
+                record = self.queue.get(timeout=self.flush_interval)
+                while True:
+                    if record is _STOP:
+                        stopped = True
+                        break
+                    batch.append(record)
+                    if len(batch) >= MAX_BATCH:
+                        break
+                    record = self.queue.get_nowait()
+            except queue.Empty:
+                pass
+
+            if batch:
+                try:
+                    self.flush(batch)
+                except Exception as e:
+                    print(f"Log sink failed to write {len(batch)} records to {self.file_path}: {repr(e)}")
+
+    def flush(self, batch: list[dict]) -> None:
+        if self.max_bytes and os.path.exists(self.file_path) and os.path.getsize(self.file_path) >= self.max_bytes:
+            self.rotate()
+
+        with codecs.open(self.file_path, 'a+', file.ENCODING_UTF8) as log_file:
+            log_file.write("".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in batch))
+
+    def rotate(self) -> None:
+        for i in range(self.backups - 1, 0, -1):
+            source = f"{self.file_path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.file_path}.{i + 1}")
+
+        if self.backups:
+            os.replace(self.file_path, f"{self.file_path}.1")
+        else:
+            os.remove(self.file_path)
+
+    def close(self) -> None:
+        """
+        Write everything still in the queue and stop the writer thread
+        """
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+
+
+def get_sink(file_path: str) -> LogSink:
+    """
+    :return: sink shared by all writers of the file
+    """
+    with _sinks_lock:
+        sink = _sinks.get(file_path)
+        if sink is None:
+            sink = LogSink(file_path)
+            _sinks[file_path] = sink
+        return sink
+
+
+@atexit.register
+def close_all() -> None:
+    with _sinks_lock:
+        for sink in _sinks.values():
+            sink.close()
@@ -0,0 +1,41 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket. Shared between workers to cap the global request rate.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        :param rate: allowed acquires per second. 0 or less means unlimited
+        :param burst: max number of acquires which can be done back to back
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Block until a token is available, then consume it
+        :return:
+        """
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait_time = (1 - self.tokens) / self.rate
+
+            time.sleep(wait_time)